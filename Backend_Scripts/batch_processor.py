@@ -0,0 +1,88 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+
+import time
+import threading
+import numpy as np
+
+
+class BatchAccumulator:
+    """Collects the digit crops of many pages into large batches for the model. A batch is sent off as soon as it
+    reaches the max batch size, and the rest by flush() once every page is added. The flush timeout is only checked
+    by poll(), for a consumer polling while another thread produces the pages; checking it after every page would
+    send a tiny batch after each page that took longer to segment than the timeout. Every prediction is stored under
+    its (filepath, field_index, digit_index) key, so the numbers of each page can be joined back together afterwards.
+
+    Args: classify: Callable taking a (N, 56, 56) crop array and returning N predicted digits,
+        max_batch_size: int,
+        flush_timeout: float, seconds, only used by poll()
+    """
+
+    __slots__ = "classify", "max_batch_size", "flush_timeout", "pages", "results", "_crops", "_keys", \
+                "_first_added", "_lock"
+
+    def __init__(self, classify, max_batch_size: int = 256, flush_timeout: float = 0.05) -> None:
+        self.classify = classify
+        self.max_batch_size = max(1, max_batch_size)
+        self.flush_timeout = flush_timeout
+
+        # Stores the digit count of every field for each page added, in the order the pages were added
+        self.pages = {}
+        # Stores the predicted digit for each (filepath, field_index, digit_index) key
+        self.results = {}
+
+        # The pending crops and their keys waiting to be sent to the model
+        self._crops = []
+        self._keys = []
+        # When the oldest pending crop was added
+        self._first_added = None
+        self._lock = threading.Lock()
+
+    def add_page(self, filepath: str, fields: list) -> None:
+        """Adds all the digit crops of a page, fields being a list of the crops of each field from left-to-right."""
+        with self._lock:
+            self.pages.update({filepath: [len(digits) for digits in fields]})
+            for field_index, digits in enumerate(fields):
+                for digit_index, crop in enumerate(digits):
+                    self._add((filepath, field_index, digit_index), crop)
+
+    def _add(self, key: tuple, crop: np.ndarray) -> None:
+        if not self._crops:
+            self._first_added = time.perf_counter()
+        self._crops.append(crop)
+        self._keys.append(key)
+        if len(self._crops) >= self.max_batch_size:
+            self._flush()
+
+    def _check_timeout(self) -> None:
+        if self._crops and time.perf_counter() - self._first_added >= self.flush_timeout:
+            self._flush()
+
+    def poll(self) -> None:
+        """Flushes the pending crops if they have waited longer than the flush timeout."""
+        with self._lock:
+            self._check_timeout()
+
+    def flush(self) -> None:
+        """Sends all the pending crops to the model, no matter how many there are."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._crops:
+            return None
+        predictions = self.classify(np.stack(self._crops))
+        self.results.update(zip(self._keys, predictions))
+        self._crops = []
+        self._keys = []
+        self._first_added = None
+        del predictions
+
+    def get_numbers(self, filepath: str) -> list:
+        """Joins the predicted digits of each field on the page back into multi-digit numbers, returns them in a list
+        of lists. Fields without any digits are skipped."""
+        numbers = []
+        for field_index, count in enumerate(self.pages[filepath]):
+            if count:
+                digits = [self.results[(filepath, field_index, digit_index)] for digit_index in range(count)]
+                numbers.append([int(''.join(map(str, digits)))])
+        return numbers
@@ -0,0 +1,77 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+
+import os
+import json
+import hashlib
+import functools
+from Backend_Scripts.utils_4_processor import check_folder_and_create, split_page_id, page_separator
+
+
+def hash_file(filepath: str, chunk_size: int = 1 << 20) -> str:
+    """Returns the sha256 hex digest of the file's bytes."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=64)
+def _hash_unchanged_file(filepath: str, signature: tuple) -> str:
+    return hash_file(filepath)
+
+
+def hash_page(page_id: str) -> str:
+    """Returns the sha256 hex digest of the page's file, with the page number on the end for a page of a multi-page
+    TIFF. The TIFF gets hashed once for all of its pages, for as long as its size and modified time stay the same."""
+    filepath, number = split_page_id(page_id)
+    if not number:
+        return hash_file(filepath)
+    stat = os.stat(filepath)
+    return f"{_hash_unchanged_file(filepath, (stat.st_size, stat.st_mtime_ns))}{page_separator}{number}"
+
+
+def hash_config(config: dict) -> str:
+    """Returns the sha256 hex digest of the config, independent of the order of its keys."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+class RecognitionCache:
+    """On-disk cache of the numbers recognized on each page, one json file per page.
+
+    Args: directory: str,
+        model_version: str
+    """
+
+    __slots__ = "directory", "model_version"
+
+    def __init__(self, directory: str, model_version: str) -> None:
+        self.directory = directory
+        self.model_version = model_version
+        check_folder_and_create(self.directory)
+
+    def get_key(self, filepath: str, config: dict, file_hash: str = None, settings: dict = None) -> str:
+        """Returns the cache key of the page, hashing the file unless its hash is given."""
+        parts = f"{file_hash or hash_page(filepath)}:{hash_config(config)}:{hash_config(settings or {})}:" \
+                f"{self.model_version}"
+        return hashlib.sha256(parts.encode()).hexdigest()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> list | None:
+        """Returns the cached numbers of the page, None if it isn't cached."""
+        try:
+            with open(self._get_path(key), 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, numbers: list) -> None:
+        """Caches the numbers of the page. Written to a temp file first, so a crash never leaves half an entry."""
+        path = self._get_path(key)
+        check_folder_and_create(os.path.dirname(path))
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(numbers, file)
+        os.replace(temp_path, path)
@@ -0,0 +1,78 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+
+"""The default settings/configs and where they are kept. Has no Tk imports, so the headless batch mode can use
+it too."""
+
+import os
+
+# The config directory path
+directory_of_configs = os.path.join(os.getcwd(), "Core", "Config")
+# The data output directory path
+directory_of_data = os.path.join(os.getcwd(), "Core", "DataOut")
+# For the paths-config file
+config_paths = "Config_Paths.json"
+path_to_config = os.path.join(directory_of_configs, config_paths)
+# For the image settings config file
+config_image = "Config_Image.json"
+path_to_config_image = os.path.join(directory_of_configs, config_image)
+# For the processing settings config file
+config_processing = "Config_Processing.json"
+path_to_config_processing = os.path.join(directory_of_configs, config_processing)
+# The registered form templates, one json file each
+directory_of_templates = os.path.join(directory_of_configs, "Templates")
+
+# For the renaming of the image files
+sheet_names = "stock_lookup.json"
+path_to_sheet_names = os.path.join(directory_of_configs, sheet_names)
+
+# The image types loaded from the scanned images folder, every page of a multi-page TIFF gets loaded
+image_extensions = [".png", ".jpg", ".jpeg", ".tif", ".tiff"]
+
+# Default Data for the configs
+default_paths_config = {"Excel Path": "~Click to Set Path!~", "Scanned Images Path": "~Click to Set Path!~",
+                        "Save Image Path": "~Click to Set Path!~"}
+default_image_config = {"Crop Min Width": 590, "Crop Max Width": 1050,
+                        "Crop Min Height": 175, "Crop Max Height": 9999,
+                        "Digit Min Width": 15, "Digit Min Height": 20,
+                        "Dilation Width": 19, "Dilation Height": 1}
+default_processing_config = {
+    # Digits sent to the model at once
+    "Batch Size": 256,
+    # Milliseconds a partly filled batch waits for more digits
+    "Batch Timeout": 50,
+    # 'keras', 'numpy' or 'tflite-float16' / 'tflite-int8'
+    "Model Backend": "keras",
+    # 'serial', 'parallel' or 'stream'
+    "Processing Mode": "serial",
+    # Segmenting processes and decoding threads, 0 uses every core
+    "Worker Count": 0,
+    # Pages that can wait between two stages of the stream
+    "Queue Depth": 4,
+    # 1 keeps the recognized numbers of each page in Core/DataOut/cache, 0 turns it off
+    "Recognition Cache": 1,
+    # Caps the memory of the decoded pages
+    "Page Cache MB": 1024,
+    # Pages either side of the shown one decoded ahead of time
+    "Page Prefetch": 2,
+    # 1 fills the page cache in the background after loading a folder
+    "Preload Pages": 1,
+    # Milliseconds the watch mode waits between checks of the folder
+    "Watch Interval": 2000,
+    # Pixels around the crop area that get segmented, at least the dilation, negative for all
+    "Crop Margin": 200,
+    # 'contours' or 'components', which finds the same fields faster on noisy scans
+    "Segmentation Engine": "contours",
+    # 1 only segments the fields of the registered form a page matches, see template_processor
+    "Form Templates": 0,
+}
+# These sheet names will be set from the Excel Component of the program
+default_sheet_names = ["STOCK SHELF 1", "STOCK SHELF 2", "STOCK SHELF 3", "STOCK SHELF 4", "STOCK SHELF 5",
+                       "STOCK SHELF 6", "STOCK SHELF 7", "STOCK SHELF 7(1)", "STOCK SHELF 8", "STOCK SHELF 9",
+                       "STOCK SHELF 10", "STOCK SHELF 10(1)", "STOCK SHELF 11", "STOCK SHELF 12", "STOCK SHELF 13",
+                       "STOCK SHELF 14", "STOCK SHELF 15", "STOCK SHELF 16", "STOCK SHELF 17", "STOCK SHELF 17(1)",
+                       "STOCK SHELF 18", "STOCK SHELF 19", "STOCK SHELF 20", "STOCK SHELF 21", "STOCK SHELF 21(1)",
+                       "STOCK SHELF 21(2)", "STOCK SHELF 22", "STOCK SHELF 22(1)", "STOCK SHELF 23",
+                       "STOCK SHELF 24", "STOCK SHELF 24(1)", "STOCK SHELF 25", "STOCK SHELF 25(1)",
+                       "STOCK SHELF 26", "STOCK SHELF A", "STOCK SHELF B", "STOCK SHELF C", "STOCK SHELF D",
+                       "STOCK SHELF E", "STOCK SHELF F", "STOCK SHELF G", "STOCK SHELF H"
+                       ]
@@ -7,48 +7,26 @@ except ImportError:  # Python 3
     import tkinter as tk
     from tkinter import ttk
 
-import os
 from copy import deepcopy
+from Backend_Scripts import config_defaults as defaults
 from Backend_Scripts.utils_4_processor import read_json, dump_json, check_folder_and_create
 
 
 class ConfigPro(ttk.Frame):
-    # The config directory path
-    _directory_of_configs = os.path.join(os.getcwd(), "Core", "Config")
-    # The data output directory path
-    _directory_of_data = os.path.join(os.getcwd(), "Core", "DataOut")
-    # For the paths-config file
-    _config_paths = "Config_Paths.json"
-    _path_to_config = os.path.join(_directory_of_configs, _config_paths)
-    # For the image settings config file
-    _config_image = "Config_Image.json"
-    _path_to_config_image = os.path.join(_directory_of_configs, _config_image)
-
-    # For the renaming of the image files
-    _sheet_names = "stock_lookup.json"
-    _path_to_sheet_names = os.path.join(_directory_of_configs, _sheet_names)
-
-    # TODO: Move all of this to a separate py file used to hardcode in default settings/configs.
-    # Default Data for the configs
-    _default_paths_config = {"Excel Path": "~Click to Set Path!~", "Scanned Images Path": "~Click to Set Path!~",
-                             "Save Image Path": "~Click to Set Path!~"}
-    _default_image_config = {"Crop Min Width": 590, "Crop Max Width": 1050,
-                             "Crop Min Height": 175, "Crop Max Height": 9999,
-                             "Digit Min Width": 15, "Digit Min Height": 20,
-                             "Dilation Width": 19, "Dilation Height": 1}
-    # These sheet names will be set from the Excel Component of the program
-    _default_sheet_names = ["STOCK SHELF 1", "STOCK SHELF 2", "STOCK SHELF 3", "STOCK SHELF 4", "STOCK SHELF 5",
-                            "STOCK SHELF 6", "STOCK SHELF 7", "STOCK SHELF 7(1)", "STOCK SHELF 8", "STOCK SHELF 9",
-                            "STOCK SHELF 10", "STOCK SHELF 10(1)", "STOCK SHELF 11", "STOCK SHELF 12", "STOCK SHELF 13",
-                            "STOCK SHELF 14", "STOCK SHELF 15", "STOCK SHELF 16", "STOCK SHELF 17", "STOCK SHELF 17(1)",
-                            "STOCK SHELF 18", "STOCK SHELF 19", "STOCK SHELF 20", "STOCK SHELF 21", "STOCK SHELF 21(1)",
-                            "STOCK SHELF 21(2)", "STOCK SHELF 22", "STOCK SHELF 22(1)", "STOCK SHELF 23",
-                            "STOCK SHELF 24", "STOCK SHELF 24(1)", "STOCK SHELF 25", "STOCK SHELF 25(1)",
-                            "STOCK SHELF 26", "STOCK SHELF A", "STOCK SHELF B", "STOCK SHELF C", "STOCK SHELF D",
-                            "STOCK SHELF E", "STOCK SHELF F", "STOCK SHELF G", "STOCK SHELF H"
-                            ]
-
-    __slots__ = "interface", "paths_config", "default_image_config", "cur_image_config"
+    # The default settings/configs and where they're kept live in config_defaults, so they can be read without Tk
+    _directory_of_configs = defaults.directory_of_configs
+    _directory_of_data = defaults.directory_of_data
+    _path_to_config = defaults.path_to_config
+    _path_to_config_image = defaults.path_to_config_image
+    _path_to_config_processing = defaults.path_to_config_processing
+    _path_to_sheet_names = defaults.path_to_sheet_names
+
+    _default_paths_config = defaults.default_paths_config
+    _default_image_config = defaults.default_image_config
+    _default_processing_config = defaults.default_processing_config
+    _default_sheet_names = defaults.default_sheet_names
+
+    __slots__ = "interface", "paths_config", "default_image_config", "cur_image_config", "processing_config"
 
     def __init__(self, interface, *args, **kwargs) -> None:
         ttk.Frame.__init__(self, interface, *args, **kwargs)
@@ -62,6 +40,8 @@ class ConfigPro(ttk.Frame):
         self.paths_config = read_json(self._path_to_config, self._default_paths_config)
         # Read in the image config
         self.default_image_config = read_json(self._path_to_config_image, self._default_image_config)
+        # Read in the processing config
+        self.processing_config = read_json(self._path_to_config_processing, self._default_processing_config)
         # Read in the default image names for the sheets
         # self.default_image_names = read_json(self._path_to_sheet_names, self._default_sheet_names)
         # Stores all the image configs in a dict from the image config panel for all the custom image settings
@@ -76,6 +56,11 @@ class ConfigPro(ttk.Frame):
         """Returns the value from the given key."""
         return self.paths_config[key]
 
+    def get_processing_config(self, key: str) -> int | str:
+        """Returns the processing setting for the given key, falling back on the default if the config file was
+        written before the setting existed."""
+        return self.processing_config.get(key, self._default_processing_config[key])
+
     def set_image_config(self, data: dict) -> None:
         """Sets the image config for the default values. Used for the settings page."""
         dump_json(self._path_to_config_image, data)
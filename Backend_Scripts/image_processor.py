@@ -8,45 +8,60 @@ except ImportError:  # Python 3
     from tkinter import ttk
     from tkinter import messagebox
 
-from PIL import Image, ImageTk
-import os
-import natsort
+from PIL import Image
 import cv2
 import numpy as np
 from copy import deepcopy
-from Backend_Scripts.utils_4_processor import read_image, convert_to_grey, sort_contours, \
-    invert_image, draw_rectangle, draw_label, write_image, timefunc
+from Backend_Scripts.utils_4_processor import draw_rectangle, draw_label, write_image, timefunc
+from Backend_Scripts.recognition_processor import RecognitionPro
+from Backend_Scripts.page_processor import PageStore
+from Backend_Scripts.mapped_processor import open_page_store
+from Backend_Scripts.segment_processor import get_field_boxes
+from Backend_Scripts.watch_processor import FolderWatcher
+from Backend_Scripts import config_defaults as defaults
 
 
 class ImagePro(ttk.Frame):
-    _extensions = [".png", ".jpg", ".jpeg"]
+    _extensions = defaults.image_extensions
+    # The most levels the display pyramid of the shown page gets, each half the size of the one before
+    _pyramid_levels = 5
 
-    __slots__ = "orig_images_paths", "_images", "original_images", "_digits_to_save", "output", "current_shown", \
-                "current_index", "current_image_path", "interface", "config_pro", "model_pro"
+    __slots__ = "orig_images_paths", "_crop_configs", "original_images", "_digits_to_save", "output", \
+                "current_shown", "current_index", "current_image_path", "interface", "config_pro", "model_pro", \
+                "recognition_pro", "_pyramid", "watcher", "current_crop", "_annotated"
 
     def __init__(self, interface, *args, **kwargs) -> None:
         ttk.Frame.__init__(self, interface, *args, **kwargs)
         self.interface = interface
         self.config_pro = interface.config_pro
         self.model_pro = interface.model_pro
+        self.recognition_pro = RecognitionPro(interface)
 
         # Stores all the filepaths to all the images before processing
         self.orig_images_paths = []
-        # Stores all the images in a numpy arrays with the filepath as key, this dict will be overridden when the
-        # preprocess method is called and the process method.
-        self._images = {}
-        # Stores the original images in a numpy array for use in the process function later on
-        self.original_images = {}
+        # Stores the image config each page was preprocessed with, pages not in here are shown as their original image
+        self._crop_configs = {}
+        # Stores the original images, decoded on demand and capped to the 'Page Cache MB' of the processing config
+        self.original_images = PageStore([], 0)
         # Stores all the cropped roi images in a numpy array with the filepath key to be saved to a separate folder
         self._digits_to_save = {}
         # Stores all the output predictions of the digits in a dict
         self.output = {}
         # Current image drawn to canvas as an array so resizing is faster than going through the dict to grab it.
         self.current_shown = None
+        # The (filepath, image config) of the current shown page if it has been preprocessed, None otherwise
+        self.current_crop = None
+        # The (page, crop, page with its fields drawn on) last rendered. Only touched from the canvas's render thread
+        self._annotated = (None, None, None)
+        # The downscaled levels of the last rendered image, the first level being that image itself. Only touched
+        # from the canvas's render thread
+        self._pyramid = [None]
         # The current index in the orig_images_paths
         self.current_index = 0
         # Stores the current images path
         self.current_image_path = None
+        # Keeps track of the images in the scanned images folder, for picking up the pages added after loading
+        self.watcher = None
 
     def load_image_paths(self) -> None:
         """Loads all the images paths into a list in memory."""
@@ -55,13 +70,20 @@ class ImagePro(ttk.Frame):
         # TODO: Do a check to see if the file in image_paths is == to the filenames in the default filenames, otherwise,
         #  rename all of them
         del self.orig_images_paths
-        self.orig_images_paths = []
-        image_paths = natsort.natsorted([f for f in os.listdir(filepath)])
-        for file in image_paths:
-            extension_check = os.path.splitext(file)[1]
-            if extension_check in self._extensions:
-                image_path = os.path.join(filepath, file)
-                self.orig_images_paths.append(image_path)
+        self.watcher = FolderWatcher(filepath, self._extensions)
+        self.orig_images_paths = self.watcher.snapshot()
+
+    def scan_folder(self) -> list:
+        """Adds the new and changed pages in the scanned images folder, returns their paths."""
+        filepaths = self.watcher.scan()
+        self.original_images.update(filepaths)
+        for filepath in filepaths:
+            if filepath not in self.orig_images_paths:
+                self.orig_images_paths.append(filepath)
+        self.recognition_pro.segment_cache.discard(filepaths)
+        if self.current_image_path in filepaths:
+            self.current_shown = self._get_page(self.current_image_path)
+        return filepaths
 
     def get_image_paths(self) -> list:
         """Returns a copy of the image paths."""
@@ -73,11 +95,11 @@ class ImagePro(ttk.Frame):
         if self.current_index >= len(self.orig_images_paths):
             self.current_index = 0
             self.current_image_path = self.orig_images_paths[self.current_index]
-            self.current_shown = self._images[self.current_image_path]
+            self.current_shown = self._get_page(self.current_image_path)
             return self.current_shown
         else:
             self.current_image_path = self.orig_images_paths[self.current_index]
-            self.current_shown = self._images[self.current_image_path]
+            self.current_shown = self._get_page(self.current_image_path)
             return self.current_shown
 
     def back_image(self) -> np.ndarray:
@@ -86,19 +108,26 @@ class ImagePro(ttk.Frame):
         if self.current_index < 0:
             self.current_index = len(self.orig_images_paths) - 1
             self.current_image_path = self.orig_images_paths[self.current_index]
-            self.current_shown = self._images[self.current_image_path]
+            self.current_shown = self._get_page(self.current_image_path)
             return self.current_shown
         else:
             self.current_image_path = self.orig_images_paths[self.current_index]
-            self.current_shown = self._images[self.current_image_path]
+            self.current_shown = self._get_page(self.current_image_path)
             return self.current_shown
 
     def set_current_image(self) -> np.ndarray:
         """Sets the current image shown to the current index where the program has left off."""
         self.current_image_path = self.orig_images_paths[self.current_index]
-        self.current_shown = self._images[self.current_image_path]
+        self.current_shown = self._get_page(self.current_image_path)
         return self.current_shown
 
+    def _get_page(self, filepath: str) -> np.ndarray:
+        """Returns the page to show and prefetches the pages around the current one."""
+        self.original_images.prefetch(self.current_index)
+        config = self._crop_configs.get(filepath)
+        self.current_crop = (filepath, config) if config is not None else None
+        return self.original_images[filepath]
+
     def get_output(self) -> tuple[dict, str] | tuple[None, None]:
         """Returns the output from the processed images if there is any along with the current image path."""
         if self.output:
@@ -125,165 +154,121 @@ class ImagePro(ttk.Frame):
         self.output = data
         del data
 
-    def resize_image(self, width: int, height: int) -> ImageTk.PhotoImage:
-        """Helper function to be called from the canvas when the window screen gets resized."""
-        return self.convert_image_from_array(self.current_shown, width, height)
+    def render_image(self, image: np.ndarray, width: int, height: int, fast: bool = False,
+                     crop: tuple = None) -> Image.Image:
+        """Resizes the image to the canvas size, drawing the fields on first if a (filepath, config) crop is given."""
+        if crop is not None:
+            image = self._get_annotated(image, *crop)
+        resized = Image.fromarray(self._get_pyramid_level(image, width, height))
+        return resized.resize((width, height), resample=Image.NEAREST if fast else Image.BICUBIC)
 
-    @staticmethod
-    def convert_image_from_array(image_array: np.ndarray, width: int, height: int) -> ImageTk.PhotoImage:
-        """Converts the numpy array image to a Tk Photo Image, and resizes to the canvas size."""
-        image = Image.fromarray(image_array)
-        resized = image.resize((width, height), resample=Image.BICUBIC)
-        del image
-        return ImageTk.PhotoImage(resized)
+    def _get_annotated(self, image: np.ndarray, filepath: str, config: dict) -> np.ndarray:
+        """Returns the page with its crop area and fields drawn on, finding the fields if they aren't cached."""
+        page, crop, annotated = self._annotated
+        if page is not image or crop != (filepath, config):
+            boxes = self.recognition_pro.segment_cache.get_boxes(filepath, image, config)
+            annotated = self._draw_crop_areas(config, get_field_boxes(image, config, boxes), image)
+            self._annotated = (image, (filepath, config), annotated)
+            del boxes
+        del page, crop
+        return annotated
+
+    def _get_pyramid_level(self, image: np.ndarray, width: int, height: int) -> np.ndarray:
+        """Returns the smallest level of the image's display pyramid that is at least width by height."""
+        if self._pyramid[0] is not image:
+            self._pyramid = [image]
+        index = 0
+        while index + 1 < self._pyramid_levels:
+            level_height, level_width = self._pyramid[index].shape[:2]
+            if level_width // 2 < width or level_height // 2 < height:
+                break
+            index += 1
+            if index == len(self._pyramid):
+                self._pyramid.append(cv2.resize(self._pyramid[index - 1], (level_width // 2, level_height // 2),
+                                                interpolation=cv2.INTER_AREA))
+        return self._pyramid[index]
 
     def load_orig_images_to_array(self) -> np.ndarray:
-        """Loads the original images, convert to grayscale and save into arrays stores it in a dict."""
-        del self._images
+        """Sets up the page store of the original images and shows the first page."""
+        self.original_images.close()
+        self.recognition_pro.segment_cache.clear()
+        del self._crop_configs
         del self.original_images
-        self._images = {}
-        for filepath in self.orig_images_paths:
-            image = read_image(filepath, -1)
-            image = convert_to_grey(image)
-            self._images.update({filepath: image})
-            del image
-        self.original_images = deepcopy(self._images)
+        self._crop_configs = {}
+        self.original_images = open_page_store(self.config_pro.get_path("Scanned Images Path"))
+        if self.original_images is None:
+            self.original_images = PageStore(self.orig_images_paths,
+                                             self.config_pro.get_processing_config("Page Cache MB") * 1024 * 1024,
+                                             self.config_pro.get_processing_config("Page Prefetch"))
         self.current_index = 0
-        self.current_shown = self._images[self.orig_images_paths[self.current_index]]
         self.current_image_path = self.orig_images_paths[self.current_index]
+        self.current_shown = self._get_page(self.current_image_path)
         return self.current_shown
 
+    def preload_pages(self, progress=None, cancel=None) -> None:
+        """Decodes the pages into the page store until the 'Page Cache MB' is full, run on a background thread."""
+        self.original_images.preload(progress, cancel, self.config_pro.get_processing_config("Worker Count"))
+
     def preprocess_all(self) -> np.ndarray | None | bool:
         """Preprocesses the images with the going to be cropped area where the digits will be selected from."""
         if not self.orig_images_paths:
             return None
-        del self._images
-        self._images = deepcopy(self.original_images)
+        del self._crop_configs
+        self._crop_configs = {}
         config_data, check = self.config_pro.get_custom_config_all()
         if not check:
             if not tk.messagebox.askyesno("Warning", "Default values are about to be used. \n"
                                                      "Would you like to proceed?", parent=self.interface):
                 return False
-            for filepath, image in self._images.items():
-                self._draw_crop_areas(config_data, image, filepath)
+            for filepath in self.orig_images_paths:
+                self._crop_configs.update({filepath: dict(config_data)})
         else:
-            for filepath, image in self._images.items():
-                self._draw_crop_areas(config_data[filepath], image, filepath)
+            for filepath in self.orig_images_paths:
+                self._crop_configs.update({filepath: dict(config_data[filepath])})
+        self.current_shown = self._get_page(self.current_image_path)
         return self.current_shown
 
     def preprocess_single(self) -> np.ndarray | None:
         if not self.orig_images_paths:
             return None
-        image = deepcopy(self.original_images[self.current_image_path])
         config_data = self.config_pro.get_custom_config_by_key(self.current_image_path)
-        self._draw_crop_areas(config_data, image, self.current_image_path)
+        self._crop_configs.update({self.current_image_path: dict(config_data)})
+        self.current_shown = self._get_page(self.current_image_path)
         return self.current_shown
 
-    def _draw_crop_areas(self, config: dict, image: np.ndarray, filepath) -> None:
-        min_width = config["Crop Min Width"]
-        max_width = config["Crop Max Width"]
-        min_height = config["Crop Min Height"]
-        max_height = config["Crop Max Height"]
-        digit_min_width = config["Digit Min Width"]
-        digit_min_height = config["Digit Min Height"]
-        dilate_x = config["Dilation Width"]
-        dilate_y = config["Dilation Height"]
-
-        thresh = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (dilate_x, dilate_y))
-        dilate = cv2.dilate(thresh, kernel, iterations=2)
-        contours = cv2.findContours(dilate, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
-        index = 0
-        for c in contours:
-            x, y, w, h = cv2.boundingRect(c)
-            # if w > digit_min_width and h > digit_min_height and x > min_width and x < max_width and y > min_height
-            # and y < max_height:
-            if w > digit_min_width and h > digit_min_height and min_width < x < max_width and \
-                    min_height < y < max_height:
-                draw_rectangle(min_width, min_height, (max_width - min_width), max_height, image)
-                draw_rectangle(x, y, w, h, image)
-                draw_label(x, y, str(index), image)
-                self._images.update({filepath: image})
-                index += 1
-        else:
-            # This grabs any image that doesn't have anything to crop on them
-            self._images.update({filepath: image})
-        self.current_shown = self._images[self.orig_images_paths[self.current_index]]
-        self.current_image_path = self.orig_images_paths[self.current_index]
-        del min_width, max_width, min_height, max_height, digit_min_width, digit_min_height, dilate_x, dilate_y
-        del thresh, kernel, dilate, contours, index
+    @staticmethod
+    def _draw_crop_areas(config: dict, boxes: list, image: np.ndarray) -> np.ndarray:
+        """Draws the crop area and the numbered boxes of the fields found in it on a copy of the page."""
+        image = image.copy()
+        if boxes:
+            min_width = config["Crop Min Width"]
+            min_height = config["Crop Min Height"]
+            draw_rectangle(min_width, min_height, (config["Crop Max Width"] - min_width), config["Crop Max Height"],
+                           image)
+        for index, (x, y, w, h) in enumerate(boxes):
+            draw_rectangle(x, y, w, h, image)
+            draw_label(x, y, str(index), image)
+        return image
 
     @timefunc
     def process_all(self, reprocess: bool) -> None:
         """Processes single and multi digits, calls the model predict function and sets the output of those
         predictions to the self.output. This function will check if an image has already been processed and skip
          those. If user wants to re-processes a single image, the process_single_image must be called."""
-        for filepath, image in self.original_images.items():
-            if reprocess:
-                numbers = self._get_numbers(image, self.config_pro.get_custom_config_by_key(filepath))
-                self.output.update({filepath: [values[0] for values in numbers]})
-                del numbers
-            else:
-                if filepath not in list(self.output.keys()):
-                    numbers = self._get_numbers(image, self.config_pro.get_custom_config_by_key(filepath))
-                    self.output.update({filepath: [values[0] for values in numbers]})
-                    del numbers
+        filepaths = [filepath for filepath in self.original_images.keys() if reprocess or filepath not in self.output]
+        self.output.update(self.recognition_pro.recognize(filepaths, self.original_images.read))
+        del filepaths
+
+    def process_pages(self, filepaths: list) -> None:
+        """Processes only the given pages, adding their predictions to the self.output."""
+        self.output.update(self.recognition_pro.recognize(filepaths, self.original_images.read))
 
     def process_single(self, reprocess: bool):
         """Processes the current shown image and sets the output into the dict. This will not check if the image has
         been processed already, it will overwrite the current output for the current image."""
         if not reprocess:
             image = self.original_images[self.current_image_path]
-            numbers = self._get_numbers(image, self.config_pro.get_custom_config_by_key(self.current_image_path))
-            self.output.update({self.current_image_path: [values[0] for values in numbers]})
+            numbers = self.recognition_pro.recognize_page(self.current_image_path, image)
+            self.output.update({self.current_image_path: numbers})
             del numbers
             del image
-
-    def _get_numbers(self, image: np.ndarray, config) -> list:
-        min_width = config["Crop Min Width"]
-        max_width = config["Crop Max Width"]
-        min_height = config["Crop Min Height"]
-        max_height = config["Crop Max Height"]
-        digit_min_width = config["Digit Min Width"]
-        digit_min_height = config["Digit Min Height"]
-        dilate_x = config["Dilation Width"]
-        dilate_y = config["Dilation Height"]
-
-        numbers = []
-        thresh = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (dilate_x, dilate_y))
-        dilate = cv2.dilate(thresh, kernel, iterations=2)
-        contours = cv2.findContours(dilate, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
-        for c in contours:
-            x, y, w, h = cv2.boundingRect(c)
-            if w > digit_min_width and h > digit_min_height and min_width < x < max_width and \
-                    min_height < y < max_height:
-                roi = image[y - 5:y + h + 5, x:x + w]
-                new_image = invert_image(roi)
-                numbers.append(self.process_multi_digits(new_image))
-                del roi, new_image
-        numbers.reverse()
-        del min_width, max_width, min_height, max_height, digit_min_width, digit_min_height, dilate_x, dilate_y
-        del thresh, kernel, dilate, contours
-        return numbers
-
-    def process_multi_digits(self, image: np.ndarray) -> list:
-        """Crops and predicts all the digits and multi-digits in the contour, returns the numbers in a list of lists."""
-        numbers = []
-        prediction = []
-        i = cv2.copyMakeBorder(src=image, top=10, bottom=10, left=10, right=10,
-                               borderType=cv2.BORDER_CONSTANT)
-
-        contours = cv2.findContours(i, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
-        contours = sort_contours(contours)[0]
-        for c in contours:
-            x, y, w, h = cv2.boundingRect(c)
-            if w > 5 or h > 5:
-                roi = i[y - 10:y + 10 + h, x - 10:x + 10 + w]
-                roi = cv2.resize(roi, dsize=(56, 56), interpolation=cv2.INTER_CUBIC)
-                image, img_shape = self.model_pro.reshape_digits(roi)
-                p = self.model_pro.model.predict(image, verbose=0)
-                prediction.append(np.argmax(p).astype(int))
-        numbers.append(int(''.join(map(str, prediction))))
-        del i, contours, roi, image, p, prediction
-        return numbers
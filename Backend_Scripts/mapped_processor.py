@@ -0,0 +1,194 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+"""Ingests a folder of scanned pages into a memory-mapped page store, so the pages never have to be decoded again.
+
+Run from the project root:
+    python -m Backend_Scripts.mapped_processor "path/to/scanned/images"
+
+Writes a Page_Store folder inside the scanned folder, holding Pages.bin with the raw uint8 grayscale pixels of every
+page back to back, and Pages_Index.json with the name, shape, offset, size, modified time and content hash of each
+page. The page store gets used in place of the image files for as long as the folder's images don't change; adding,
+removing or editing any of them falls back to decoding until the folder is ingested again.
+"""
+
+import os
+import sys
+import json
+import functools
+import argparse
+import numpy as np
+from Backend_Scripts import config_defaults as defaults
+from Backend_Scripts.cache_processor import hash_page
+from Backend_Scripts.page_processor import decode_pages
+from Backend_Scripts.utils_4_processor import read_grey_image, get_image_paths, check_folder_and_create, timefunc, \
+    split_page_id
+
+_store_folder = "Page_Store"
+_store_data = "Pages.bin"
+_store_index = "Pages_Index.json"
+
+
+def get_store_directory(folder: str) -> str:
+    return os.path.join(folder, _store_folder)
+
+
+def _get_signature(filepath: str) -> list:
+    stat = os.stat(split_page_id(filepath)[0])
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+@timefunc
+def ingest_folder(folder: str, workers: int = 0, progress=None, cancel=None) -> str | None:
+    """Decodes every page in the folder to grayscale into a new page store, returns the directory it was written
+    to, None if it was cancelled. The pages are decoded on a pool of threads, calling progress(done, total) after
+    each one. The index is written last, so a page store that was cut off part way is never opened."""
+    directory = get_store_directory(folder)
+    check_folder_and_create(directory)
+    data_path = os.path.join(directory, _store_data)
+    index_path = os.path.join(directory, _store_index)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    filepaths = get_image_paths(folder, defaults.image_extensions)
+    pages = []
+    offset = 0
+    with open(data_path, 'wb') as file:
+        for filepath, image in decode_pages(filepaths, workers, cancel):
+            file.write(image.tobytes())
+            pages.append({"name": os.path.basename(filepath), "shape": list(image.shape), "offset": offset,
+                          "signature": _get_signature(filepath), "hash": hash_page(filepath)})
+            offset += image.nbytes
+            del image
+            if progress is not None:
+                progress(len(pages), len(filepaths))
+    if len(pages) != len(filepaths):
+        return None
+    temp_path = f"{index_path}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump({"size": offset, "pages": pages}, file, indent=4)
+    os.replace(temp_path, index_path)
+    del pages
+    return directory
+
+
+def open_page_store(folder: str):
+    """Returns the page store of the folder, None if it has none or the folder's images have changed since."""
+    try:
+        store = MappedPageStore(get_store_directory(folder), folder)
+    except (FileNotFoundError, ValueError, KeyError, json.JSONDecodeError):
+        return None
+    return store if store.is_current() else None
+
+
+def open_page_stores(filepaths: list) -> dict:
+    """Returns the current page store of every folder the filepaths are in, with the folder as key."""
+    stores = {}
+    for folder in {os.path.dirname(filepath) for filepath in filepaths}:
+        store = open_page_store(folder)
+        if store is not None:
+            stores.update({folder: store})
+    return stores
+
+
+@functools.lru_cache(maxsize=None)
+def get_worker_store(directory: str, folder: str):
+    """Opens the page store once per process, for the worker processes sharing its pages through the page cache."""
+    return MappedPageStore(directory, folder)
+
+
+class MappedPageStore:
+    """The pages of an ingested folder, mapped read only from Pages.bin. Getting a page is a zero-copy view into the
+    mapping, so any number of processes can share the pages and reopening the folder decodes nothing. Takes the same
+    calls as the PageStore, so the ImagePro can use either.
+
+    Args: directory: str, the Page_Store folder,
+        folder: str, the scanned folder the paths of the pages are joined to
+    """
+
+    __slots__ = "directory", "folder", "filepaths", "_pages", "_data", "_outside"
+
+    def __init__(self, directory: str, folder: str) -> None:
+        self.directory = directory
+        self.folder = folder
+        with open(os.path.join(directory, _store_index), 'r') as file:
+            index = json.load(file)
+        self.filepaths = [os.path.join(folder, page["name"]) for page in index["pages"]]
+        self._pages = dict(zip(self.filepaths, index["pages"]))
+        data_path = os.path.join(directory, _store_data)
+        if os.path.getsize(data_path) != index["size"]:
+            raise ValueError(f"'{data_path}' doesn't match its index.")
+        self._data = np.memmap(data_path, dtype=np.uint8, mode='r') if index["size"] else np.empty(0, np.uint8)
+        # The pages added to or changed in the folder after it was ingested, which get decoded instead
+        self._outside = set()
+        del index
+
+    def is_current(self) -> bool:
+        """Checks the folder still holds exactly the ingested images, unmodified."""
+        try:
+            return get_image_paths(self.folder, defaults.image_extensions) == self.filepaths and \
+                all(_get_signature(filepath) == page["signature"] for filepath, page in self._pages.items())
+        except FileNotFoundError:
+            return False
+
+    def get_hash(self, filepath: str) -> str:
+        """Returns the content hash of the page's image file, recorded when it was ingested."""
+        return self._pages[filepath]["hash"]
+
+    def __len__(self) -> int:
+        return len(self.filepaths)
+
+    def __iter__(self):
+        return iter(self.filepaths)
+
+    def __contains__(self, filepath: str) -> bool:
+        return filepath in self._pages or filepath in self._outside
+
+    def keys(self) -> list:
+        return list(self.filepaths)
+
+    def __getitem__(self, filepath: str) -> np.ndarray:
+        if filepath in self._outside:
+            return read_grey_image(filepath)
+        page = self._pages[filepath]
+        height, width = page["shape"]
+        return self._data[page["offset"]:page["offset"] + height * width].reshape(height, width)
+
+    def read(self, filepath: str) -> np.ndarray:
+        return self[filepath]
+
+    def update(self, filepaths: list) -> None:
+        """Has the pages added to or changed in the folder since it was ingested decoded from their files, until the
+        folder gets ingested again."""
+        for filepath in filepaths:
+            if filepath not in self:
+                self.filepaths.append(filepath)
+            self._outside.add(filepath)
+
+    def prefetch(self, index: int) -> None:
+        """Nothing to prefetch, the OS pages the mapping in on demand."""
+        return None
+
+    def preload(self, progress=None, cancel=None, workers: int = 0) -> None:
+        """Nothing to decode, every page is already in the mapping."""
+        return None
+
+    def close(self) -> None:
+        """Drops the mapping. Views already handed out keep it alive until they're gone."""
+        self._data = np.empty(0, np.uint8)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Ingests a folder of scanned pages into a memory-mapped page store.")
+    parser.add_argument("folder", help="Folder of scanned pages.")
+    parser.add_argument("--workers", type=int, default=0, help="Threads decoding the pages, 0 uses every core.")
+    args = parser.parse_args()
+
+    directory = ingest_folder(args.folder, args.workers,
+                              lambda done, total: print(f"\rDecoded {done}/{total} pages", end="", flush=True))
+    print()
+    store = MappedPageStore(directory, args.folder)
+    size = os.path.getsize(os.path.join(directory, _store_data))
+    print(f"Wrote {len(store)} pages ({size // (1024 * 1024)} MB) to '{directory}'.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+"""Converts the Keras model into the formats the other model backends run, and reports how they compare to it.
+
+Run from the project root:
+    python -m Backend_Scripts.model_converter tflite --pages "path/to/scanned/images"
+    python -m Backend_Scripts.model_converter numpy [--pages "path/to/scanned/images"]
+
+'tflite' writes New_Optimizer_Model_float16.tflite and New_Optimizer_Model_int8.tflite next to the Keras model. The
+digit crops cut from the scanned pages are used as the representative dataset for the int8 calibration, and for the
+accuracy-vs-latency report printed at the end.
+
+'numpy' writes the weights to New_Optimizer_Model.npz for the NumPy backend. When pages are given, the NumPy
+predictions are checked against the Keras model on their crops.
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+from Backend_Scripts.model_processor import ModelPro
+from Backend_Scripts.numpy_processor import NumpyCNN, supported_activations
+from Backend_Scripts.segment_processor import get_digit_crops
+from Backend_Scripts.utils_4_processor import read_grey_image, read_json, get_image_paths
+from Backend_Scripts import config_defaults as defaults
+
+
+def load_crops(pages_dir: str, config: dict, limit: int) -> np.ndarray:
+    """Cuts the digit crops out of the scanned pages the same way the processing does, returns up to limit crops
+    in a float32 (N, 56, 56, 1) array."""
+    crops = []
+    for filepath in get_image_paths(pages_dir, defaults.image_extensions):
+        image = read_grey_image(filepath)
+        for digits in get_digit_crops(image, config):
+            crops.extend(digits)
+        if len(crops) >= limit:
+            break
+    if not crops:
+        raise ValueError(f"No digit crops could be cut from the pages in '{pages_dir}'.")
+    return np.stack(crops[:limit]).reshape(-1, 56, 56, 1).astype(np.float32)
+
+
+def convert(quantization: str, crops: np.ndarray) -> str:
+    """Converts the Keras model with the given quantization and writes it to disk, returns the path written."""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(ModelPro.get_model_path("keras"), compile=False)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        def representative_dataset():
+            for crop in crops:
+                yield [crop[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"Unknown quantization '{quantization}'.")
+    path = ModelPro.get_tflite_path(quantization)
+    with open(path, 'wb') as file:
+        file.write(converter.convert())
+    return path
+
+
+def _get_layer_spec(layer) -> dict | None:
+    """Returns what the NumPy forward pass needs to know about the Keras layer, or None for layers that do nothing
+    at inference."""
+    class_name = type(layer).__name__
+    config = layer.get_config()
+    if class_name in ("InputLayer", "Dropout", "SpatialDropout2D", "GaussianNoise", "GaussianDropout",
+                      "ActivityRegularization") or class_name.startswith("Random"):
+        return None
+    if config.get("data_format", "channels_last") != "channels_last":
+        raise ValueError(f"Layer '{layer.name}' isn't channels_last.")
+    if class_name == "Conv2D" and tuple(config["dilation_rate"]) == (1, 1) and config.get("groups", 1) == 1:
+        spec = {"type": "conv", "strides": list(config["strides"]), "padding": config["padding"],
+                "activation": config["activation"], "use_bias": config["use_bias"]}
+    elif class_name in ("MaxPooling2D", "AveragePooling2D"):
+        spec = {"type": "pool", "mode": "max" if class_name == "MaxPooling2D" else "average",
+                "pool_size": list(config["pool_size"]), "strides": list(config["strides"] or config["pool_size"]),
+                "padding": config["padding"]}
+    elif class_name in ("GlobalMaxPooling2D", "GlobalAveragePooling2D") and not config.get("keepdims"):
+        spec = {"type": "global_pool", "mode": "max" if class_name == "GlobalMaxPooling2D" else "average"}
+    elif class_name == "Dense":
+        spec = {"type": "dense", "activation": config["activation"], "use_bias": config["use_bias"]}
+    elif class_name == "BatchNormalization" and config["axis"] in (-1, 3, [-1], [3]):
+        spec = {"type": "batch_norm", "epsilon": config["epsilon"]}
+    elif class_name == "Rescaling":
+        spec = {"type": "rescale", "scale": float(config["scale"]), "offset": float(config["offset"])}
+    elif class_name == "Flatten":
+        spec = {"type": "flatten"}
+    elif class_name in ("Activation", "Softmax"):
+        spec = {"type": "activation", "activation": config.get("activation", "softmax")}
+    elif class_name == "ReLU" and config["max_value"] is None and not config["negative_slope"] and \
+            not config["threshold"]:
+        spec = {"type": "activation", "activation": "relu"}
+    else:
+        raise ValueError(f"Layer '{layer.name}' ({class_name}) isn't supported by the NumPy backend.")
+    if spec.get("activation", "linear") not in supported_activations:
+        raise ValueError(f"Activation '{spec['activation']}' of layer '{layer.name}' isn't supported.")
+    return spec
+
+
+def export_numpy() -> str:
+    """Dumps the weights of the Keras model and the layers they belong to into an .npz file for the NumPy backend,
+    returns the path written."""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(ModelPro.get_model_path("keras"), compile=False)
+    specs = []
+    arrays = {}
+    for layer in model.layers:
+        spec = _get_layer_spec(layer)
+        if spec is None:
+            continue
+        if spec["type"] == "batch_norm":
+            channels = layer.moving_mean.shape[-1]
+            weights = [layer.gamma.numpy() if layer.scale else np.ones(channels),
+                       layer.beta.numpy() if layer.center else np.zeros(channels),
+                       layer.moving_mean.numpy(), layer.moving_variance.numpy()]
+        else:
+            weights = layer.get_weights()
+        spec.update({"weights": len(weights)})
+        for i, weight in enumerate(weights):
+            arrays.update({f"{len(specs)}_{i}": np.asarray(weight, dtype=np.float32)})
+        specs.append(spec)
+    path = ModelPro.get_model_path("numpy")
+    np.savez(path, layers=np.array(json.dumps(specs)), **arrays)
+    return path
+
+
+def report(crops: np.ndarray, backend_names: list, batch_size: int) -> list:
+    """Runs the crops through every backend, returns the rows of the accuracy-vs-latency report. Accuracy is the
+    share of crops predicted the same as the Keras model."""
+    rows = []
+    reference = None
+    for name in backend_names:
+        backend = ModelPro.load_backend(name)
+        backend.predict(crops[:batch_size])
+        predictions = []
+        start = time.perf_counter()
+        for i in range(0, len(crops), batch_size):
+            predictions.append(backend.predict(crops[i:i + batch_size]))
+        elapsed = time.perf_counter() - start
+        predictions = np.concatenate(predictions)
+        if reference is None:
+            reference = predictions
+        rows.append({"Backend": name,
+                     "Agreement": float(np.mean(predictions == reference)),
+                     "Ms Per Batch": elapsed * 1000 / -(-len(crops) // batch_size),
+                     "Ms Per Digit": elapsed * 1000 / len(crops)})
+        del backend
+    return rows
+
+
+def _print_report(rows: list) -> None:
+    print(f"{'Backend':<16}{'Agreement':>12}{'Ms Per Batch':>16}{'Ms Per Digit':>16}")
+    for row in rows:
+        print(f"{row['Backend']:<16}{row['Agreement']:>12.2%}{row['Ms Per Batch']:>16.3f}{row['Ms Per Digit']:>16.4f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Converts the Keras model for the other model backends.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    tflite_parser = subparsers.add_parser("tflite", help="Write float16 and int8 quantized TensorFlow Lite models.")
+    numpy_parser = subparsers.add_parser("numpy", help="Export the weights for the NumPy backend.")
+    for sub_parser in (tflite_parser, numpy_parser):
+        sub_parser.add_argument("--pages", required=sub_parser is tflite_parser,
+                                help="Folder of scanned pages to cut the crops from.")
+        sub_parser.add_argument("--config", default=defaults.path_to_config_image,
+                                help="Image config used to cut the crops.")
+        sub_parser.add_argument("--samples", type=int, default=1000, help="Max number of crops to use.")
+        sub_parser.add_argument("--batch-size", type=int, default=32, help="Batch size used for the report.")
+    args = parser.parse_args()
+
+    crops = None
+    if args.pages:
+        crops = load_crops(args.pages, read_json(args.config), args.samples)
+        print(f"Cut {len(crops)} digit crops from '{args.pages}'.")
+
+    if args.command == "tflite":
+        for quantization in ModelPro.quantizations:
+            path = convert(quantization, crops)
+            print(f"Wrote {path} ({os.path.getsize(path) // 1024} KB)")
+        _print_report(report(crops, ["keras"] + [f"tflite-{quantization}" for quantization in ModelPro.quantizations],
+                             args.batch_size))
+    else:
+        path = export_numpy()
+        print(f"Wrote {path} ({os.path.getsize(path) // 1024} KB)")
+        if crops is not None:
+            difference = np.max(np.abs(NumpyCNN(path).forward(crops) -
+                                       ModelPro.load_backend("keras").model.predict(crops, verbose=0)))
+            print(f"Max difference from the Keras output: {difference:.2e}")
+            _print_report(report(crops, ["keras", "numpy"], args.batch_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,221 @@
 # Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
 
 import os
+import threading
 import numpy as np
-import tensorflow as tf
-from tensorflow import keras
+from concurrent.futures import Future
+from Backend_Scripts.numpy_processor import NumpyCNN
+from Backend_Scripts.cache_processor import hash_file
+
+
+class KerasBackend:
+    """Runs the Keras model through a tf.function with a fixed input signature, so it is traced once and never
+    again."""
+
+    __slots__ = "model", "_classifier"
+
+    def __init__(self, model_path: str, image_size: int) -> None:
+        import tensorflow as tf
+
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+        model = self.model
+
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None, image_size, image_size, 1), dtype=tf.float32)])
+        def classifier(batch):
+            return tf.argmax(model(batch, training=False), axis=1)
+
+        self._classifier = classifier
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Returns the predicted digit for every crop in the float32 (N, 56, 56, 1) batch."""
+        return self._classifier(batch).numpy()
+
+
+class TFLiteBackend:
+    """Runs a converted TensorFlow Lite model. Uses the small tflite_runtime package if it's installed, otherwise
+    the interpreter that ships with TensorFlow. One interpreter is kept per batch size, since resizing the input
+    tensor means reallocating all the tensors."""
+
+    __slots__ = "model_path", "_interpreter_class", "_interpreters"
+
+    def __init__(self, model_path: str, image_size: int) -> None:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter  # NOQA
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"No converted model at '{model_path}'. "
+                                    f"Run 'python -m Backend_Scripts.model_converter tflite' first.")
+        self.model_path = model_path
+        self._interpreter_class = Interpreter
+        self._interpreters = {}
+
+    def _get_interpreter(self, size: int):
+        """Returns the interpreter for the batch size, creating it the first time the size is seen."""
+        interpreter = self._interpreters.get(size)
+        if interpreter is None:
+            interpreter = self._interpreter_class(model_path=self.model_path)
+            input_details = interpreter.get_input_details()[0]
+            interpreter.resize_tensor_input(input_details['index'], [size, *input_details['shape'][1:]])
+            interpreter.allocate_tensors()
+            self._interpreters.update({size: interpreter})
+        return interpreter
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Returns the predicted digit for every crop in the float32 (N, 56, 56, 1) batch."""
+        interpreter = self._get_interpreter(len(batch))
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+        # Fully integer models take quantized input
+        if input_details['dtype'] in (np.int8, np.uint8):
+            scale, zero_point = input_details['quantization']
+            batch = np.clip(np.round(batch / scale + zero_point), np.iinfo(input_details['dtype']).min,
+                            np.iinfo(input_details['dtype']).max)
+        interpreter.set_tensor(input_details['index'], batch.astype(input_details['dtype']))
+        interpreter.invoke()
+        return np.argmax(interpreter.get_tensor(output_details['index']), axis=1)
 
 
 class ModelPro:
-    _path_to_model = os.path.join(os.getcwd(), "Core", "Model", "New_Optimizer_Model.h5")
+    _directory_of_model = os.path.join(os.getcwd(), "Core", "Model")
+    _model_name = "New_Optimizer_Model"
+    _path_to_model = os.path.join(_directory_of_model, f"{_model_name}.h5")
+    _path_to_numpy_model = os.path.join(_directory_of_model, f"{_model_name}.npz")
+    _image_size = 56
+    # Batches get padded up to one of these sizes, so the classifier only ever sees a few batch shapes. 256 is the
+    # default 'Batch Size', so full batches go through unpadded
+    _batch_buckets = (1, 8, 32, 128, 256, 512)
+    # The quantized variants the converter writes next to the Keras model
+    quantizations = ("float16", "int8")
 
-    __slots__ = "interface", "config_pro", "model"
+    __slots__ = "interface", "config_pro", "backend_name", "loader", "_backend_future", "_version"
 
     def __init__(self, interface) -> None:
         self.interface = interface
         self.config_pro = interface.config_pro
-        self.model = tf.keras.models.load_model(self._path_to_model, compile=False)
+        self.backend_name = self.config_pro.get_processing_config("Model Backend")
+        # The (model path, version) of the model file, hashed the first time it's asked for
+        self._version = None
+
+        # The backend gets loaded and warmed up in the background, so importing TensorFlow doesn't hold up the
+        # window. Anything that needs the backend waits on the future.
+        self._backend_future = Future()
+        self.loader = threading.Thread(target=self._load, daemon=True)
+        self.loader.start()
+
+    def _load(self) -> None:
+        """Loads and warms up the backend, then resolves the future with it. Runs on the loader thread."""
+        try:
+            backend = self.load_backend(self.backend_name)
+            if self._uses_buckets(backend):
+                self._warm_up(backend)
+            self._backend_future.set_result(backend)
+        except BaseException as e:
+            self._backend_future.set_exception(e)
+
+    def is_ready(self) -> bool:
+        """Returns True once the backend has finished loading, or failed to."""
+        return self._backend_future.done()
+
+    def get_load_error(self) -> BaseException | None:
+        """Returns the error the backend failed to load with, None if it's still loading or loaded fine."""
+        if not self._backend_future.done():
+            return None
+        return self._backend_future.exception()
+
+    def wait_until_ready(self, timeout: float = None) -> KerasBackend | TFLiteBackend | NumpyCNN:
+        """Blocks until the backend is loaded and returns it. Raises the load error if loading failed."""
+        return self._backend_future.result(timeout)
+
+    @property
+    def backend(self) -> KerasBackend | TFLiteBackend | NumpyCNN:
+        return self.wait_until_ready()
+
+    @classmethod
+    def get_tflite_path(cls, quantization: str) -> str:
+        """Returns the path to the converted TensorFlow Lite model for the given quantization."""
+        return os.path.join(cls._directory_of_model, f"{cls._model_name}_{quantization}.tflite")
+
+    @classmethod
+    def get_model_path(cls, backend_name: str) -> str:
+        """Returns the path to the model file the backend loads, 'keras', 'numpy' or 'tflite-<quantization>'."""
+        if backend_name == "keras":
+            return cls._path_to_model
+        if backend_name == "numpy":
+            return cls._path_to_numpy_model
+        kind, _, quantization = backend_name.partition("-")
+        if kind == "tflite" and quantization in cls.quantizations:
+            return cls.get_tflite_path(quantization)
+        raise ValueError(f"Unknown model backend '{backend_name}'.")
+
+    @classmethod
+    def load_backend(cls, backend_name: str) -> KerasBackend | TFLiteBackend | NumpyCNN:
+        """Loads the backend by name, 'keras', 'numpy' or 'tflite-<quantization>'. Only the Keras and TFLite
+        backends import TensorFlow."""
+        model_path = cls.get_model_path(backend_name)
+        if backend_name == "keras":
+            return KerasBackend(model_path, cls._image_size)
+        if backend_name == "numpy":
+            if not os.path.isfile(model_path):
+                raise FileNotFoundError(f"No exported weights at '{model_path}'. "
+                                        f"Run 'python -m Backend_Scripts.model_converter numpy' first.")
+            return NumpyCNN(model_path)
+        return TFLiteBackend(model_path, cls._image_size)
+
+    def get_version(self) -> str:
+        """Returns the backend name and the hash of its model file, which changes whenever the model does. Doesn't
+        wait for the backend to load."""
+        model_path = self.get_model_path(self.backend_name)
+        if self._version is None or self._version[0] != model_path:
+            version = f"{self.backend_name}-{hash_file(model_path)[:16]}" if os.path.isfile(model_path) \
+                else f"{self.backend_name}-missing"
+            self._version = (model_path, version)
+        return self._version[1]
+
+    @staticmethod
+    def _uses_buckets(backend: KerasBackend | TFLiteBackend | NumpyCNN) -> bool:
+        """Checks if the backend pays for every new batch shape. The NumpyCNN doesn't, so it's neither warmed up nor
+        given padded batches."""
+        return not isinstance(backend, NumpyCNN)
+
+    def _warm_up(self, backend: KerasBackend | TFLiteBackend | NumpyCNN) -> None:
+        """Runs every bucket size through the backend once, so the first real batch doesn't pay for it."""
+        for size in self._batch_buckets:
+            backend.predict(np.zeros((size, self._image_size, self._image_size, 1), dtype=np.float32))
+
+    def _get_bucket(self, size: int) -> int:
+        """Returns the smallest bucket the batch size fits into."""
+        for bucket in self._batch_buckets:
+            if size <= bucket:
+                return bucket
+        return self._batch_buckets[-1]
+
+    def classify(self, batch: np.ndarray) -> np.ndarray:
+        """Predicts the digit of every 56x56 crop in the batch, returns the predicted digits in a 1D array.
+        Batches are padded with blank crops up to a bucket size, except for the NumpyCNN, and split if bigger than the
+        largest bucket. Waits for the backend to finish loading if it hasn't yet."""
+        backend = self.backend
+        pad = self._uses_buckets(backend)
+        batch = batch.reshape(-1, self._image_size, self._image_size, 1).astype(np.float32)
+        predictions = []
+        largest = self._batch_buckets[-1]
+        for start in range(0, len(batch), largest):
+            chunk = batch[start:start + largest]
+            size = len(chunk)
+            bucket = self._get_bucket(size) if pad else size
+            if bucket > size:
+                chunk = np.concatenate([chunk, np.zeros((bucket - size, *chunk.shape[1:]), dtype=np.float32)])
+            predictions.append(backend.predict(chunk)[:size])
+        del batch, pad
+        return np.concatenate(predictions) if predictions else np.empty(0, dtype=np.int64)
 
     @staticmethod
     def reshape_digits(train_dataset: np.ndarray, val_dataset: np.ndarray = None, image_size: int = 56) -> \
             tuple[np.ndarray, np.ndarray, tuple[int, int, int]] | tuple[np.ndarray, tuple[int, int, int]]:
         """Reshapes the image array based off of image input of channels first or last."""
+        from tensorflow import keras
+
         if keras.backend.image_data_format() == 'channels_first':
             in_shape = (1, image_size, image_size)
             train_dataset = train_dataset.reshape(-1, image_size, image_size, 1)  # NOQA
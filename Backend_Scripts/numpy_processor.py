@@ -0,0 +1,116 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+
+import json
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+
+_activations = {"linear": lambda x: x,
+                "relu": lambda x: np.maximum(x, 0),
+                "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+                "tanh": np.tanh,
+                "softmax": _softmax}
+# The activations the exporter can write a layer with
+supported_activations = tuple(_activations.keys())
+
+
+def _pad_same(x: np.ndarray, size: tuple, strides: tuple, value: float = 0.0) -> np.ndarray:
+    """Pads the height and width of the NHWC array the same way Keras does for padding='same'."""
+    pads = [(0, 0)]
+    for axis in (1, 2):
+        length, k, s = x.shape[axis], size[axis - 1], strides[axis - 1]
+        total = max((-(-length // s) - 1) * s + k - length, 0)
+        pads.append((total // 2, total - total // 2))
+    pads.append((0, 0))
+    return np.pad(x, pads, constant_values=value)
+
+
+def _windows(x: np.ndarray, size: tuple, strides: tuple) -> np.ndarray:
+    """Returns a (N, out_h, out_w, C, size_h, size_w) view of every window of the NHWC array."""
+    return sliding_window_view(x, size, axis=(1, 2))[:, ::strides[0], ::strides[1]]
+
+
+class NumpyCNN:
+    """Runs the forward pass of the digit CNN with nothing but NumPy, from the weights exported by
+    'python -m Backend_Scripts.model_converter numpy'. Convolutions are done with im2col and a single matmul per
+    layer. Only the layers a sequential digit classifier uses are supported; the exporter refuses anything else.
+
+    Args: model_path: str, path to the exported .npz file
+    """
+
+    __slots__ = "layers"
+
+    def __init__(self, model_path: str) -> None:
+        with np.load(model_path, allow_pickle=False) as data:
+            specs = json.loads(str(data["layers"]))
+            self.layers = [(spec, [data[f"{index}_{i}"] for i in range(spec["weights"])])
+                           for index, spec in enumerate(specs)]
+
+    def forward(self, batch: np.ndarray) -> np.ndarray:
+        """Returns the output of the last layer for the float32 (N, 56, 56, 1) batch."""
+        x = batch.astype(np.float32)
+        for spec, weights in self.layers:
+            x = getattr(self, f"_{spec['type']}")(x, spec, weights)
+        return x
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Returns the predicted digit for every crop in the float32 (N, 56, 56, 1) batch."""
+        return np.argmax(self.forward(batch), axis=1)
+
+    @staticmethod
+    def _conv(x: np.ndarray, spec: dict, weights: list) -> np.ndarray:
+        kernel = weights[0]
+        kh, kw, channels, filters = kernel.shape
+        strides = tuple(spec["strides"])
+        if spec["padding"] == "same":
+            x = _pad_same(x, (kh, kw), strides)
+        windows = _windows(x, (kh, kw), strides)
+        n, out_h, out_w = windows.shape[:3]
+        # im2col: every window becomes a row, ordered (C, kh, kw) to match the transposed kernel
+        columns = windows.reshape(n * out_h * out_w, channels * kh * kw)
+        out = columns @ kernel.transpose(2, 0, 1, 3).reshape(channels * kh * kw, filters)
+        if spec["use_bias"]:
+            out += weights[1]
+        return _activations[spec["activation"]](out.reshape(n, out_h, out_w, filters))
+
+    @staticmethod
+    def _pool(x: np.ndarray, spec: dict, weights: list) -> np.ndarray:
+        size, strides = tuple(spec["pool_size"]), tuple(spec["strides"])
+        reduce = np.max if spec["mode"] == "max" else np.mean
+        if spec["padding"] == "same":
+            x = _pad_same(x, size, strides, -np.inf if spec["mode"] == "max" else np.nan)
+            reduce = np.max if spec["mode"] == "max" else np.nanmean
+        return reduce(_windows(x, size, strides), axis=(4, 5))
+
+    @staticmethod
+    def _global_pool(x: np.ndarray, spec: dict, weights: list) -> np.ndarray:
+        return np.max(x, axis=(1, 2)) if spec["mode"] == "max" else np.mean(x, axis=(1, 2))
+
+    @staticmethod
+    def _dense(x: np.ndarray, spec: dict, weights: list) -> np.ndarray:
+        out = x @ weights[0]
+        if spec["use_bias"]:
+            out += weights[1]
+        return _activations[spec["activation"]](out)
+
+    @staticmethod
+    def _batch_norm(x: np.ndarray, spec: dict, weights: list) -> np.ndarray:
+        gamma, beta, mean, variance = weights
+        return (x - mean) / np.sqrt(variance + spec["epsilon"]) * gamma + beta
+
+    @staticmethod
+    def _rescale(x: np.ndarray, spec: dict, weights: list) -> np.ndarray:
+        return x * spec["scale"] + spec["offset"]
+
+    @staticmethod
+    def _flatten(x: np.ndarray, spec: dict, weights: list) -> np.ndarray:
+        return x.reshape(len(x), -1)
+
+    @staticmethod
+    def _activation(x: np.ndarray, spec: dict, weights: list) -> np.ndarray:
+        return _activations[spec["activation"]](x)
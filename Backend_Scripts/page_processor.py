@@ -0,0 +1,212 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+
+import os
+import threading
+import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from Backend_Scripts.utils_4_processor import read_grey_image
+
+
+def load_page(filepath: str) -> np.ndarray:
+    """Decodes the page at the filepath to a grey image."""
+    return read_grey_image(filepath)
+
+
+def decode_pages(filepaths: list, workers: int = 0, cancel: threading.Event = None):
+    """Generator decoding the pages on a pool of threads, yielding (filepath, image) in the order of the filepaths.
+    OpenCV lets go of the GIL while it decodes, so the threads decode in parallel. Only twice as many pages as there
+    are workers are decoded ahead of the one being yielded, and nothing more is yielded once the cancel event is set.
+
+    Args: filepaths: list[str],
+        workers: int, 0 uses every core,
+        cancel: threading.Event
+    """
+    workers = workers or os.cpu_count()
+    remaining = iter(filepaths)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for filepath in remaining:
+            pending.append((filepath, executor.submit(load_page, filepath)))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            if cancel is not None and cancel.is_set():
+                break
+            filepath, future = pending.popleft()
+            image = future.result()
+            for next_filepath in remaining:
+                pending.append((next_filepath, executor.submit(load_page, next_filepath)))
+                break
+            yield filepath, image
+            del image
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PageStore:
+    """Holds the decoded grey pages of a folder in least recently used order, bounded by a memory budget, so any
+    number of pages can be paged through without decoding them all up front. Pages are decoded on first use, and
+    prefetch() decodes the pages around the shown one on a background thread so going forward or back doesn't wait on
+    the decode. The pages in the prefetch window are never evicted, so the budget should hold at least that many.
+
+    Args: filepaths: list[str],
+        max_bytes: int, the memory budget of the decoded pages,
+        lookahead: int, how many pages either side of the shown page get prefetched
+    """
+
+    __slots__ = "filepaths", "max_bytes", "lookahead", "_positions", "_pages", "_bytes", "_pinned", "_loading", \
+                "_pending", "_condition", "_thread", "_closed"
+
+    def __init__(self, filepaths: list, max_bytes: int, lookahead: int = 2) -> None:
+        self.filepaths = list(filepaths)
+        self.max_bytes = max_bytes
+        self.lookahead = max(0, lookahead)
+        self._positions = {filepath: index for index, filepath in enumerate(self.filepaths)}
+        self._pages = OrderedDict()
+        self._bytes = 0
+        # The pages in the prefetch window, which eviction skips
+        self._pinned = set()
+        # The pages being decoded right now, so two threads never decode the same page
+        self._loading = set()
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self.filepaths)
+
+    def __iter__(self):
+        return iter(self.filepaths)
+
+    def __contains__(self, filepath: str) -> bool:
+        return filepath in self._positions
+
+    def keys(self) -> list:
+        return list(self.filepaths)
+
+    def __getitem__(self, filepath: str) -> np.ndarray:
+        """Returns the page, decoding it if it isn't in the store, and makes it the most recently used."""
+        return self._get(filepath, True)
+
+    def read(self, filepath: str) -> np.ndarray:
+        """Returns the page without adding it to the store, for single passes over every page that would otherwise
+        evict the pages around the shown one."""
+        return self._get(filepath, False)
+
+    def _get(self, filepath: str, keep: bool) -> np.ndarray:
+        if filepath not in self._positions:
+            raise KeyError(filepath)
+        with self._condition:
+            while filepath not in self._pages and filepath in self._loading:
+                self._condition.wait()
+            if filepath in self._pages:
+                if keep:
+                    self._pages.move_to_end(filepath)
+                return self._pages[filepath]
+            self._loading.add(filepath)
+        page = None
+        try:
+            page = load_page(filepath)
+        finally:
+            with self._condition:
+                self._loading.discard(filepath)
+                if keep and page is not None:
+                    self._add(filepath, page)
+                self._condition.notify_all()
+        return page
+
+    def _add(self, filepath: str, page: np.ndarray) -> None:
+        """Adds the page and evicts the least recently used pages outside the prefetch window until under budget."""
+        self._pages[filepath] = page
+        self._bytes += page.nbytes
+        for key in list(self._pages.keys()):
+            if self._bytes <= self.max_bytes:
+                break
+            if key in self._pinned or key == filepath:
+                continue
+            self._bytes -= self._pages.pop(key).nbytes
+
+    def update(self, filepaths: list) -> None:
+        """Adds the filepaths that are new to the store, and drops the decoded page of the ones already in it, for
+        pages that were added to or changed in the folder."""
+        with self._condition:
+            for filepath in filepaths:
+                if filepath in self._positions:
+                    page = self._pages.pop(filepath, None)
+                    if page is not None:
+                        self._bytes -= page.nbytes
+                else:
+                    self._positions.update({filepath: len(self.filepaths)})
+                    self.filepaths.append(filepath)
+
+    def prefetch(self, index: int) -> None:
+        """Queues the pages around the index to be decoded in the background, nearest first. Wraps around the ends
+        the same way going forward and back does, and drops whatever was queued for the page shown before."""
+        count = len(self.filepaths)
+        if not count:
+            return None
+        order = [index] + [i for step in range(1, self.lookahead + 1) for i in (index + step, index - step)]
+        window = list(dict.fromkeys(self.filepaths[i % count] for i in order))
+        with self._condition:
+            self._pinned = set(window)
+            self._pending.clear()
+            self._pending.extend(filepath for filepath in window if filepath not in self._pages)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+        del order, window
+
+    def preload(self, progress=None, cancel: threading.Event = None, workers: int = 0) -> None:
+        """Decodes the pages not in the store yet on a pool of threads, in order, until the memory budget is full.
+        Calls progress(done, total) after every page, total being how many pages are expected to fit, and stops
+        early once the cancel event is set."""
+        with self._condition:
+            filepaths = [filepath for filepath in self.filepaths if filepath not in self._pages]
+            free = self.max_bytes - self._bytes
+        total = len(filepaths)
+        done = 0
+        pages = decode_pages(filepaths, workers, cancel)
+        for filepath, page in pages:
+            if not done:
+                # Scans of a folder are about the same size, so the first page tells how many will fit
+                total = min(total, max(1, free // max(page.nbytes, 1)))
+            if page.nbytes > free:
+                break
+            with self._condition:
+                if filepath not in self._pages:
+                    self._add(filepath, page)
+                    free -= page.nbytes
+            done += 1
+            if progress is not None:
+                progress(done, total)
+            if done >= total:
+                break
+        pages.close()
+        del filepaths, pages
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return None
+                filepath = self._pending.popleft()
+            try:
+                self._get(filepath, True)
+            except Exception:
+                # A page that can't be decoded is left for __getitem__ to raise on when it gets shown
+                continue
+
+    def close(self) -> None:
+        """Stops the prefetch thread and frees every page."""
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._pages.clear()
+            self._bytes = 0
+            self._condition.notify_all()
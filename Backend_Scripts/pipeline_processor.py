@@ -0,0 +1,113 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+
+import queue
+import threading
+from Backend_Scripts.batch_processor import BatchAccumulator
+from Backend_Scripts.segment_processor import get_field_images, crop_digits, unpack_fields, SegmentCache
+from Backend_Scripts.utils_4_processor import read_grey_image
+
+
+class StagedPipeline:
+    """Runs every stage on its own thread, connected by bounded queues. While the last stage works on one item the
+    stages before it are already working on the next ones, so the total time approaches that of the slowest stage,
+    and no more than queue_depth items ever wait between two stages.
+
+    Args: stages: list of callables, each taking the output of the stage before it,
+        queue_depth: int
+    """
+
+    _end = object()
+
+    __slots__ = "stages", "queue_depth", "_stop", "_error"
+
+    def __init__(self, stages: list, queue_depth: int = 4) -> None:
+        self.stages = stages
+        self.queue_depth = max(1, queue_depth)
+        self._stop = threading.Event()
+        self._error = None
+
+    def _put(self, q: queue.Queue, item) -> None:
+        """Puts the item on the queue, giving up once the pipeline is stopped so no thread is left blocking."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return None
+            except queue.Full:
+                continue
+
+    def _feed(self, items, out_queue: queue.Queue) -> None:
+        try:
+            for item in items:
+                if self._stop.is_set():
+                    break
+                self._put(out_queue, item)
+        except Exception as e:
+            self._error = self._error or e
+        self._put(out_queue, self._end)
+
+    def _run_stage(self, stage, in_queue: queue.Queue, out_queue: queue.Queue) -> None:
+        while not self._stop.is_set():
+            try:
+                item = in_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is self._end:
+                break
+            # After an error the rest of the items are drained, so the stages before this one don't block
+            if self._error is not None:
+                continue
+            try:
+                self._put(out_queue, stage(item))
+            except Exception as e:
+                self._error = self._error or e
+        self._put(out_queue, self._end)
+
+    def run(self, items, poll=None, poll_interval: float = 0.05):
+        """Generator yielding the output of the last stage for each item, in order. poll gets called every
+        poll_interval seconds while waiting on the last stage. Raises the first error any stage ran into."""
+        queues = [queue.Queue(maxsize=self.queue_depth) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0]), daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._run_stage, args=(stage, queues[index], queues[index + 1]),
+                                            daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                try:
+                    item = queues[-1].get(timeout=poll_interval)
+                except queue.Empty:
+                    if poll is not None:
+                        poll()
+                    continue
+                if item is self._end:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+        if self._error is not None:
+            raise self._error
+
+
+def segment_stream(filepaths: list, get_config, accumulator: BatchAccumulator, queue_depth: int = 4,
+                   read_page=read_grey_image, segment_cache: SegmentCache = None) -> None:
+    """Streams the pages through decode -> segment -> crop stages and feeds the crops of each page to the
+    accumulator as soon as they're ready. Only about queue_depth pages per stage are ever held in memory.
+
+    Args: filepaths: list[str],
+        get_config: Callable returning the image config for a filepath,
+        accumulator: BatchAccumulator,
+        queue_depth: int,
+        read_page: Callable returning the grey image for a filepath,
+        segment_cache: SegmentCache the boxes found on each page are taken from and cached in
+    """
+    segment_cache = segment_cache or SegmentCache()
+    stages = [lambda filepath: (filepath, read_page(filepath)),
+              lambda item: (item[0], get_field_images(item[1], get_config(item[0]),
+                                                      segment_cache.get_boxes(item[0], item[1], get_config(item[0])))),
+              lambda item: (item[0], unpack_fields(*crop_digits(item[1])))]
+    pipeline = StagedPipeline(stages, queue_depth)
+    poll_interval = max(accumulator.flush_timeout, 0.01)
+    for filepath, fields in pipeline.run(filepaths, poll=accumulator.poll, poll_interval=poll_interval):
+        accumulator.add_page(filepath, fields)
+        del fields
@@ -0,0 +1,159 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from Backend_Scripts import config_defaults as defaults
+from Backend_Scripts.batch_processor import BatchAccumulator
+from Backend_Scripts.cache_processor import RecognitionCache
+from Backend_Scripts.mapped_processor import open_page_stores
+from Backend_Scripts.pipeline_processor import segment_stream
+from Backend_Scripts.segment_processor import get_digit_crops, segment_file, unpack_fields, init_worker, \
+    SegmentCache
+from Backend_Scripts.template_processor import TemplateRegistry
+from Backend_Scripts.utils_4_processor import read_grey_image
+
+
+class RecognitionPro:
+    """Turns pages into the numbers written on them, using the 'Processing Mode' from the processing config. Has no
+    Tk dependencies, so it's shared by the ImagePro and the headless batch mode.
+
+    Args: interface: Anything with a config_pro and a model_pro
+    """
+
+    _directory_of_cache = os.path.join(defaults.directory_of_data, "cache")
+
+    __slots__ = "config_pro", "model_pro", "_cache", "segment_cache"
+
+    def __init__(self, interface) -> None:
+        self.config_pro = interface.config_pro
+        self.model_pro = interface.model_pro
+        self._cache = None
+        # The boxes found on each page, shared with the pre-processing preview of the ImagePro
+        templates = None
+        if self.config_pro.get_processing_config("Form Templates"):
+            templates = TemplateRegistry(defaults.directory_of_templates)
+        self.segment_cache = SegmentCache(self.config_pro.get_processing_config("Crop Margin"),
+                                          self.config_pro.get_processing_config("Segmentation Engine"), templates)
+        del templates
+
+    def get_cache(self) -> RecognitionCache | None:
+        """Returns the recognition cache for the current model, None if the cache is turned off."""
+        if not self.config_pro.get_processing_config("Recognition Cache"):
+            return None
+        model_version = self.model_pro.get_version()
+        if self._cache is None or self._cache.model_version != model_version:
+            self._cache = RecognitionCache(self._directory_of_cache, model_version)
+        return self._cache
+
+    def get_segment_settings(self) -> dict:
+        """Returns the processing settings that change what gets segmented on a page, for the recognition cache. The
+        form templates in use are told apart by their fingerprint."""
+        templates = self.segment_cache.templates
+        return {"Crop Margin": self.segment_cache.margin, "Segmentation Engine": self.segment_cache.engine,
+                "Form Templates": templates.fingerprint if templates is not None else None}
+
+    def _new_accumulator(self) -> BatchAccumulator:
+        return BatchAccumulator(self.model_pro.classify, self.config_pro.get_processing_config("Batch Size"),
+                                self.config_pro.get_processing_config("Batch Timeout") / 1000)
+
+    def recognize(self, filepaths: list, get_image=None) -> dict:
+        """Recognizes all the pages, returns the numbers of each page in a list with the filepath as key, in the same
+        order as the filepaths. Pages found in the recognition cache skip segmentation and inference entirely.
+
+        Args: filepaths: list[str],
+            get_image: Callable returning the already loaded grey image for a filepath. The serial mode reads the
+                pages from disk without it, the parallel and stream modes always do. Pages of a folder with a
+                current page store are read from its mapping instead of the disk.
+        """
+        stores = open_page_stores(filepaths)
+        cache = self.get_cache()
+        if cache is None:
+            return self._recognize(filepaths, stores, get_image)
+        keys = {}
+        settings = self.get_segment_settings()
+        for filepath in filepaths:
+            store = stores.get(os.path.dirname(filepath))
+            keys.update({filepath: cache.get_key(filepath, self.config_pro.get_custom_config_by_key(filepath),
+                                                 store.get_hash(filepath) if store is not None else None, settings)})
+        cached = {filepath: cache.get(key) for filepath, key in keys.items()}
+        output = self._recognize([filepath for filepath in filepaths if cached[filepath] is None], stores, get_image)
+        for filepath, numbers in output.items():
+            cache.put(keys[filepath], numbers)
+        output = {filepath: output[filepath] if cached[filepath] is None else cached[filepath]
+                  for filepath in filepaths}
+        del keys, settings, cached, stores
+        return output
+
+    def _recognize(self, filepaths: list, stores: dict, get_image=None) -> dict:
+        """Recognizes all the pages without the cache. The digit crops of all the pages are gathered into shared
+        batches, so the model is called with full batches no matter how few fields each page has."""
+        if not filepaths:
+            return {}
+
+        def read_page(filepath: str):
+            store = stores.get(os.path.dirname(filepath))
+            return store[filepath] if store is not None else read_grey_image(filepath)
+
+        accumulator = self._new_accumulator()
+        mode = self.config_pro.get_processing_config("Processing Mode")
+        if mode == "parallel":
+            self._segment_parallel(filepaths, stores, accumulator)
+        elif mode == "stream":
+            segment_stream(filepaths, self.config_pro.get_custom_config_by_key, accumulator,
+                           self.config_pro.get_processing_config("Queue Depth"), read_page, self.segment_cache)
+        else:
+            for filepath in filepaths:
+                image = get_image(filepath) if get_image else read_page(filepath)
+                config = self.config_pro.get_custom_config_by_key(filepath)
+                fields = get_digit_crops(image, config, self.segment_cache.get_boxes(filepath, image, config))
+                accumulator.add_page(filepath, fields)
+                del image, config, fields
+        accumulator.flush()
+        output = {filepath: [values[0] for values in accumulator.get_numbers(filepath)] for filepath in filepaths}
+        del accumulator, mode
+        return output
+
+    def recognize_page(self, filepath: str, image) -> list:
+        """Recognizes a single already loaded page, returns its numbers in a list."""
+        accumulator = self._new_accumulator()
+        config = self.config_pro.get_custom_config_by_key(filepath)
+        boxes = self.segment_cache.get_boxes(filepath, image, config)
+        accumulator.add_page(filepath, get_digit_crops(image, config, boxes))
+        accumulator.flush()
+        numbers = [values[0] for values in accumulator.get_numbers(filepath)]
+        del accumulator, config, boxes
+        return numbers
+
+    def _segment_parallel(self, filepaths: list, stores: dict, accumulator: BatchAccumulator) -> None:
+        """Spreads the segmentation of the pages over a pool of worker processes. The workers send back the packed
+        digit crops of each page, which are fed to the accumulator here as they come in. Pages in a page store are
+        read by the workers straight from its mapping, so only the filepath and where the store is get sent. The
+        boxes cached in the segment cache are sent along, and the ones the workers find get cached. Only twice as many
+        pages as there are workers are submitted at a time, so the finished pages never pile up in memory."""
+        workers = self.config_pro.get_processing_config("Worker Count") or os.cpu_count()
+        locations = {folder: (store.directory, store.folder) for folder, store in stores.items()}
+        pending = set()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            for filepath in filepaths:
+                config = self.config_pro.get_custom_config_by_key(filepath)
+                pending.add(executor.submit(segment_file, filepath, config, locations.get(os.path.dirname(filepath)),
+                                            self.segment_cache.get(filepath, config),
+                                            self.segment_cache.get_window(config), self.segment_cache.engine,
+                                            self.segment_cache.templates))
+                if len(pending) >= workers * 2:
+                    pending = self._add_segmented(pending, accumulator)
+            while pending:
+                pending = self._add_segmented(pending, accumulator)
+        del locations, pending
+
+    def _add_segmented(self, pending: set, accumulator: BatchAccumulator) -> set:
+        """Waits for at least one of the pending pages to be segmented, adds the crops of every finished page to the
+        accumulator and returns the pages still pending. The finished futures are let go of here."""
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            filepath, crops, counts, boxes = future.result()
+            self.segment_cache.put(filepath, self.config_pro.get_custom_config_by_key(filepath), boxes)
+            accumulator.add_page(filepath, unpack_fields(crops, counts))
+            del crops, counts, boxes
+        del done
+        return pending
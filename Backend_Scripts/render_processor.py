@@ -0,0 +1,57 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+
+import threading
+
+
+class RenderWorker:
+    """Runs render jobs on a background thread, so resampling never holds up the Tk main loop. Only the newest job
+    matters: a job still waiting when a newer one is submitted is dropped, and the result of one that was already
+    running is thrown away. Tk isn't thread safe, so the main loop polls get_result() and makes the PhotoImage itself.
+    """
+
+    __slots__ = "_condition", "_job", "_result", "_generation", "_running", "_thread"
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._job = None
+        self._result = None
+        # Bumped by every submit, a result is only handed out if it's from the latest generation
+        self._generation = 0
+        self._running = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args) -> None:
+        """Queues func(*args) to be run, replacing any job that hasn't started yet."""
+        with self._condition:
+            self._generation += 1
+            self._job = (self._generation, func, args)
+            self._result = None
+            self._condition.notify()
+
+    def get_result(self) -> tuple:
+        """Returns (result, busy), the result of the latest job once it's done, which gets forgotten, None until then,
+        and whether the latest job is still waiting or running. Both are read under the same lock, so a job finishing
+        in between can't be missed."""
+        with self._condition:
+            result, self._result = self._result, None
+            return result, self._job is not None or self._running
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._job is None:
+                    self._condition.wait()
+                generation, func, args = self._job
+                self._job = None
+                self._running = True
+            try:
+                result = func(*args)
+            except Exception as e:
+                print(f"Render failed: {e}")
+                result = None
+            with self._condition:
+                self._running = False
+                if generation == self._generation:
+                    self._result = result
+            del func, args, result
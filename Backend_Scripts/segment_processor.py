@@ -0,0 +1,326 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+"""Finds the fields on the pages and cuts out their digits.
+
+Run from the project root to check the 'components' segmentation engine against the 'contours' one:
+    python -m Backend_Scripts.segment_processor "path/to/scanned/images" --config Core/Config/Config_Image.json
+
+Segments every page with both engines and lists the pages they found different fields on, exiting with 1 if there
+are any.
+"""
+
+import sys
+import time
+import argparse
+import cv2
+import threading
+import numpy as np
+from Backend_Scripts import config_defaults as defaults
+from Backend_Scripts.utils_4_processor import invert_image, read_grey_image, read_json, \
+    get_image_paths
+from Backend_Scripts.mapped_processor import get_worker_store
+
+segmentation_engines = ["contours", "components"]
+# Up to how many components the boxes are checked against each other before looking for components in holes
+_nesting_check_limit = 64
+
+
+def get_digit_crops(image: np.ndarray, config: dict, boxes: np.ndarray = None) -> list:
+    """Finds all the fields on the page, returns the 56x56 digit crops of each field in a list of (N, 56, 56) arrays,
+    all views into one array holding the crops of the whole page."""
+    return unpack_fields(*crop_digits(get_field_images(image, config, boxes)))
+
+
+def get_field_images(image: np.ndarray, config: dict, boxes: np.ndarray = None) -> list:
+    """Finds all the fields on the page, returns the inverted image of each field in a list."""
+    fields = [invert_image(image[y - 5:y + h + 5, x:x + w]) for x, y, w, h in get_field_boxes(image, config, boxes)]
+    fields.reverse()
+    return fields
+
+
+def get_field_boxes(image: np.ndarray, config: dict, boxes: np.ndarray = None) -> list:
+    """Finds all the fields inside the crop area of the page, returns the (x, y, w, h) box of each field in a list.
+    The boxes of every contour on the page are found first unless they're given, e.g. from the SegmentCache."""
+    if boxes is None:
+        boxes = find_boxes(image, config["Dilation Width"], config["Dilation Height"])
+    return filter_boxes(boxes, config)
+
+
+def get_window(config: dict, margin: int) -> tuple[int, int, int, int] | None:
+    """Returns the (x0, y0, x1, y1) crop area grown by the margin, None for the whole page if the margin is negative."""
+    if margin < 0:
+        return None
+    # The dilation spreads ink this far, so anything closer to the crop area gets dilated the same as on the page
+    margin_x, margin_y = max(margin, config["Dilation Width"]), max(margin, config["Dilation Height"])
+    return (config["Crop Min Width"] - margin_x, config["Crop Min Height"] - margin_y,
+            config["Crop Max Width"] + margin_x, config["Crop Max Height"] + margin_y)
+
+
+def find_boxes(image: np.ndarray, dilate_x: int, dilate_y: int, window: tuple = None, engine: str = "contours",
+               threshold: float = None) -> np.ndarray:
+    """Thresholds and dilates the page or a window of it, returns the (x, y, w, h) box of every contour on the page."""
+    x0 = y0 = 0
+    if window is not None:
+        x0, y0 = max(window[0], 0), max(window[1], 0)
+        image = image[y0:max(window[3], y0), x0:max(window[2], x0)]
+    if not image.size:
+        return np.empty((0, 4), dtype=np.int32)
+    if threshold is None:
+        thresh = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    else:
+        thresh = cv2.threshold(image, threshold, 255, cv2.THRESH_BINARY_INV)[1]
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (dilate_x, dilate_y))
+    dilate = cv2.dilate(thresh, kernel, iterations=2)
+    if engine == "components":
+        boxes = get_component_boxes(dilate)
+    else:
+        contours = cv2.findContours(dilate, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+        boxes = np.array([cv2.boundingRect(c) for c in contours], dtype=np.int32).reshape(-1, 4)
+        del contours
+    boxes[:, 0] += x0
+    boxes[:, 1] += y0
+    del thresh, kernel, dilate
+    return boxes
+
+
+def get_component_boxes(mask: np.ndarray) -> np.ndarray:
+    """Returns the bounding box of every outermost connected component of the mask in a (N, 4) array, in the order
+    findContours with RETR_EXTERNAL gives their contours. Everything is done on whole arrays, no matter how many
+    components there are. Components sitting in a hole of another one are dropped the same way RETR_EXTERNAL drops
+    them: only components touching the background that's reachable from the edge of the mask are kept."""
+    count, labels, stats = cv2.connectedComponentsWithStats(mask, connectivity=8)[:3]
+    outermost = _get_outermost(mask, count, labels, stats)
+    # findContours finds the components by the raster order of their first pixel, the leftmost one on their top
+    # row, and returns them last found first. Only the rows some component starts on are looked at
+    rows = np.unique(stats[1:, cv2.CC_STAT_TOP])
+    starts = labels[rows]
+    starts = starts[(starts != 0) & (stats[starts, cv2.CC_STAT_TOP] == rows[:, None])]
+    order = starts[np.sort(np.unique(starts, return_index=True)[1])]
+    order = order[outermost[order]][::-1]
+    boxes = np.ascontiguousarray(stats[order, :4], dtype=np.int32)
+    del labels, stats, outermost, rows, starts, order
+    return boxes
+
+
+def _get_outermost(mask: np.ndarray, count: int, labels: np.ndarray, stats: np.ndarray) -> np.ndarray:
+    """Returns which of the components aren't in a hole of another one, as a boolean array indexed by label."""
+    outermost = np.ones(count, dtype=bool)
+    outermost[0] = False
+    if count <= _nesting_check_limit:
+        # A component in a hole lies strictly inside the box of the one around it, which a few boxes rule out cheaply
+        left, top, width, height = stats[1:, :4].T
+        right, bottom = left + width, top + height
+        if not ((left[:, None] > left) & (top[:, None] > top) & (right[:, None] < right) &
+                (bottom[:, None] < bottom)).any():
+            return outermost
+    outside = cv2.copyMakeBorder(mask, 1, 1, 1, 1, borderType=cv2.BORDER_CONSTANT, value=0)
+    cv2.floodFill(outside, None, (0, 0), 128)
+    outside = cv2.dilate(np.uint8(outside == 128), cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3)))[1:-1, 1:-1]
+    outermost[:] = False
+    outermost[labels[(outside != 0) & (mask != 0)]] = True
+    outermost[0] = False
+    del outside
+    return outermost
+
+
+def locate_boxes(image: np.ndarray, config: dict, window: tuple = None, engine: str = "contours",
+                 templates=None) -> np.ndarray:
+    """Returns the boxes of every contour on the page, found only inside the fields of the form template the page
+    matches if there are templates, see the TemplateRegistry, otherwise inside the window."""
+    boxes = templates.find_boxes(image, config, engine) if templates else None
+    if boxes is None:
+        boxes = find_window_boxes(image, config, window, engine)
+    return boxes
+
+
+def find_window_boxes(image: np.ndarray, config: dict, window: tuple = None, engine: str = "contours") -> np.ndarray:
+    """Finds the boxes inside the window, growing it by half its size past any edge a box in the crop area runs into."""
+    height, width = image.shape[:2]
+    while True:
+        boxes = find_boxes(image, config["Dilation Width"], config["Dilation Height"], window, engine)
+        if window is None:
+            return boxes
+        x0, y0, x1, y1 = window
+        x, y, w, h = boxes.T
+        # Boxes reaching into the crop area, a box cut off at an edge inside the page may really start outside it
+        inside = (x + w > config["Crop Min Width"]) & (x < config["Crop Max Width"]) & \
+            (y + h > config["Crop Min Height"]) & (y < config["Crop Max Height"])
+        left = x0 > 0 and bool((inside & (x <= x0)).any())
+        top = y0 > 0 and bool((inside & (y <= y0)).any())
+        right = x1 < width and bool((inside & (x + w >= x1)).any())
+        bottom = y1 < height and bool((inside & (y + h >= y1)).any())
+        del x, y, w, h, inside
+        if not (left or top or right or bottom):
+            return boxes
+        grow_x, grow_y = (x1 - x0) // 2 + 1, (y1 - y0) // 2 + 1
+        window = (x0 - grow_x if left else x0, y0 - grow_y if top else y0,
+                  x1 + grow_x if right else x1, y1 + grow_y if bottom else y1)
+
+
+def filter_boxes(boxes: np.ndarray, config: dict) -> list:
+    """Returns the boxes of the fields inside the crop area and over the digit min size, in a list. Filters all the
+    boxes at once with a mask, so changing the crop area or digit min size re-filters a page's cached boxes right
+    away; they stay in the order the contours were found in."""
+    x, y, w, h = boxes.T
+    mask = (w > config["Digit Min Width"]) & (h > config["Digit Min Height"]) & \
+        (x > config["Crop Min Width"]) & (x < config["Crop Max Width"]) & \
+        (y > config["Crop Min Height"]) & (y < config["Crop Max Height"])
+    fields = list(map(tuple, boxes[mask].tolist()))
+    del x, y, w, h, mask
+    return fields
+
+
+class SegmentCache:
+    """Keeps the boxes of every contour found on each page for the dilation and window they were found with.
+
+    Args: margin: int, how many pixels around the crop area get segmented, negative segments the whole page,
+        engine: str, one of the segmentation_engines,
+        templates: TemplateRegistry of the forms the pages are matched against, None to always segment the window
+    """
+
+    __slots__ = "margin", "engine", "templates", "_boxes", "_lock"
+
+    def __init__(self, margin: int = -1, engine: str = "contours", templates=None) -> None:
+        self.margin = margin
+        self.engine = engine
+        self.templates = templates
+        # The (dilation, window, boxes) of each page, with the page's path as key
+        self._boxes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_dilation(config: dict) -> tuple[int, int]:
+        return config["Dilation Width"], config["Dilation Height"]
+
+    def get_window(self, config: dict) -> tuple[int, int, int, int] | None:
+        """Returns the region of the page segmented for the config."""
+        return get_window(config, self.margin)
+
+    def get(self, filepath: str, config: dict) -> np.ndarray | None:
+        """Returns the boxes of the page found with the config's dilation and window, None if they aren't cached."""
+        with self._lock:
+            dilation, window, boxes = self._boxes.get(filepath, (None, None, None))
+        if dilation != self._get_dilation(config) or window != self.get_window(config):
+            return None
+        return boxes
+
+    def put(self, filepath: str, config: dict, boxes: np.ndarray) -> None:
+        """Caches the boxes of the page found for the config, replacing any found before."""
+        with self._lock:
+            self._boxes.update({filepath: (self._get_dilation(config), self.get_window(config), boxes)})
+
+    def get_boxes(self, filepath: str, image: np.ndarray, config: dict) -> np.ndarray:
+        """Returns the boxes of the page found for the config, finding and caching them if needed."""
+        boxes = self.get(filepath, config)
+        if boxes is None:
+            boxes = locate_boxes(image, config, self.get_window(config), self.engine, self.templates)
+            self.put(filepath, config, boxes)
+        return boxes
+
+    def discard(self, filepaths: list) -> None:
+        """Drops the boxes of pages whose image changed."""
+        with self._lock:
+            for filepath in filepaths:
+                self._boxes.pop(filepath, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._boxes.clear()
+
+
+def split_digits(field: np.ndarray) -> np.ndarray:
+    """Finds the digits in the field, returns their (x, y, w, h) boxes from left-to-right in a (N, 4) array. Every
+    pixel that isn't black counts, and specks no bigger than 5x5 are skipped."""
+    if not field.size:
+        return np.empty((0, 4), dtype=np.int32)
+    boxes = get_component_boxes(np.uint8(field != 0))
+    boxes = boxes[np.argsort(boxes[:, 0], kind='stable')]
+    return boxes[(boxes[:, 2] > 5) | (boxes[:, 3] > 5)]
+
+
+def crop_digits(fields: list) -> tuple[np.ndarray, list]:
+    """Cuts the digits out of every field, returns their 56x56 crops packed into one (N, 56, 56) array and the digit
+    count of each field. The array is allocated once for the page and each digit, with 10 pixels of black around it,
+    is resized straight into its slot, so nothing is allocated per digit. The packed crops are much cheaper to send
+    between processes than lists of small arrays."""
+    splits = [split_digits(field) for field in fields]
+    counts = [len(boxes) for boxes in splits]
+    crops = np.empty((sum(counts), 56, 56), dtype=np.uint8)
+    index = 0
+    for field, boxes in zip(fields, splits):
+        if not len(boxes):
+            continue
+        padded = cv2.copyMakeBorder(src=field, top=10, bottom=10, left=10, right=10, borderType=cv2.BORDER_CONSTANT)
+        for x, y, w, h in boxes.tolist():
+            cv2.resize(padded[y:y + h + 20, x:x + w + 20], dsize=(56, 56), dst=crops[index],
+                       interpolation=cv2.INTER_CUBIC)
+            index += 1
+        del padded
+    del splits
+    return crops, counts
+
+
+def unpack_fields(crops: np.ndarray, counts: list) -> list:
+    """Splits the packed crops back into the crops of each field, as views into the packed array."""
+    return np.split(crops, np.cumsum(counts)[:-1]) if counts else []
+
+
+def init_worker() -> None:
+    """Keeps OpenCV single threaded in the worker processes, since the pages are already spread over the cores."""
+    cv2.setNumThreads(1)
+
+
+def segment_file(filepath: str, config: dict, store: tuple = None, boxes: np.ndarray = None, window: tuple = None,
+                 engine: str = "contours", templates=None) -> tuple[str, np.ndarray, list, np.ndarray]:
+    """Reads the page and cuts out its digit crops. Meant to be run in a worker process, so only the filepath goes
+    in and the packed crops come out. With the (directory, folder) of a page store the page is read from its mapping
+    instead of being decoded. The boxes of every contour in the window are sent back too, for the SegmentCache of the
+    main process, and aren't found again if they're given."""
+    image = get_worker_store(*store)[filepath] if store else read_grey_image(filepath)
+    if boxes is None:
+        boxes = locate_boxes(image, config, window, engine, templates)
+    crops, counts = crop_digits(get_field_images(image, config, boxes))
+    del image
+    return filepath, crops, counts, boxes
+
+
+def compare_engines(filepaths: list, config: dict, margin: int = -1) -> list:
+    """Segments every page with each of the segmentation_engines, returns the paths of the pages the engines found
+    different fields on. Prints how long each engine took in total."""
+    mismatched = []
+    times = dict.fromkeys(segmentation_engines, 0.0)
+    window = get_window(config, margin)
+    for filepath in filepaths:
+        image = read_grey_image(filepath)
+        fields = []
+        for engine in segmentation_engines:
+            start = time.perf_counter()
+            boxes = find_window_boxes(image, config, window, engine)
+            times[engine] += time.perf_counter() - start
+            fields.append(filter_boxes(boxes, config))
+            del boxes
+        if any(found != fields[0] for found in fields[1:]):
+            mismatched.append(filepath)
+        del image, fields
+    for engine, seconds in times.items():
+        print(f"Engine: {engine}, Time: {seconds}")
+    del times, window
+    return mismatched
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Checks the segmentation engines find the same fields.")
+    parser.add_argument("folder", help="Folder of scanned pages.")
+    parser.add_argument("--config", default=defaults.path_to_config_image, help="Image config used for every page.")
+    parser.add_argument("--margin", type=int, default=-1, help="Crop Margin, negative segments the whole page.")
+    args = parser.parse_args()
+
+    filepaths = get_image_paths(args.folder, defaults.image_extensions)
+    mismatched = compare_engines(filepaths, read_json(args.config, defaults.default_image_config), args.margin)
+    for filepath in mismatched:
+        print(f"Different fields found on '{filepath}'.")
+    print(f"The engines agree on {len(filepaths) - len(mismatched)}/{len(filepaths)} pages.")
+    return 1 if mismatched else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+"""Registers the printed forms the pages are scanned from, so the fields of a page are only looked for where the
+form has them.
+
+Run from the project root:
+    python -m Backend_Scripts.template_processor register "path/to/filled/page.png" --name "STOCK SHELF 1"
+    python -m Backend_Scripts.template_processor list
+    python -m Backend_Scripts.template_processor remove "STOCK SHELF 1"
+
+The page registered must have every field of the form filled in, since only the fields found on it are looked for
+on the other pages: a field left empty on it is silently dropped from every page matching the form. Each template is
+written to Core/Config/Templates as a json file holding the page size, the box of every field and the row and column
+ink profiles of the page. Templates are only used once 'Form Templates' is set to 1 in the processing config, then
+every page is matched against the templates and segmented only inside the fields of the one it matches.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import cv2
+import numpy as np
+from Backend_Scripts import config_defaults as defaults
+from Backend_Scripts.segment_processor import find_boxes, filter_boxes
+from Backend_Scripts.utils_4_processor import read_grey_image, read_json, dump_json, check_folder_and_create
+
+# The profiles are taken from the page shrunk by this much, a scan's printed lines are still kept at that size
+_profile_shrink = 4
+# The scales a page is tried at against a template, scanners rarely stretch a page more than a few percent
+_scales = np.linspace(0.95, 1.05, 21)
+# The furthest a page is tried shifted against a template, as a part of the page's length
+_max_shift = 0.1
+# How well both profiles of a page have to correlate with a template's for the page to match it
+_min_score = 0.5
+# How many pixels around each field of the template get segmented, for numbers written wider or off the field
+_field_margin = 40
+
+
+def get_profiles(image: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the mean ink of every row and every column of the shrunk page, each scaled to zero mean and unit
+    variance."""
+    height, width = image.shape[:2]
+    small = cv2.resize(image, (max(1, width // _profile_shrink), max(1, height // _profile_shrink)),
+                       interpolation=cv2.INTER_AREA)
+    ink = 255 - small.astype(np.float32)
+    rows, columns = _normalize(ink.mean(axis=1)), _normalize(ink.mean(axis=0))
+    del small, ink
+    return rows, columns
+
+
+def _normalize(profile: np.ndarray) -> np.ndarray:
+    deviation = profile.std()
+    return (profile - profile.mean()) / deviation if deviation else np.zeros_like(profile)
+
+
+def align_profiles(reference: np.ndarray, profile: np.ndarray) -> tuple[float, float, float]:
+    """Finds the scale and shift putting the template's profile over the page's, returns (scale, shift, score). A
+    position p on the template is at p * scale + shift on the page, in profile units, and the score is the
+    correlation of the two profiles at that fit."""
+    length = len(profile)
+    limit = int(length * _max_shift)
+    positions = np.arange(length, dtype=np.float32)
+    padded = np.pad(profile, limit)
+    best = (1.0, 0.0, -1.0)
+    for scale in _scales:
+        scaled = _normalize(np.interp(positions / scale, np.arange(len(reference)), reference, left=0, right=0))
+        # The correlation of the page shifted by -limit up to limit against the scaled template
+        correlation = np.correlate(padded, scaled, mode='valid') / length
+        index = int(np.argmax(correlation))
+        if correlation[index] > best[2]:
+            best = (float(scale), float(index - limit), float(correlation[index]))
+        del scaled, correlation
+    del positions, padded
+    return best
+
+
+class FormTemplate:
+    """A registered form, the page size, field boxes and profiles of the page it was registered from.
+
+    Args: name: str,
+        shape: tuple[int, int], the (height, width) of the page,
+        fields: np.ndarray, the (x, y, w, h) box of every field in a (N, 4) array,
+        rows: np.ndarray, the row profile,
+        columns: np.ndarray, the column profile
+    """
+
+    __slots__ = "name", "shape", "fields", "rows", "columns"
+
+    def __init__(self, name: str, shape: tuple, fields: np.ndarray, rows: np.ndarray, columns: np.ndarray) -> None:
+        self.name = name
+        self.shape = tuple(shape)
+        self.fields = np.asarray(fields, dtype=np.int32).reshape(-1, 4)
+        self.rows = np.asarray(rows, dtype=np.float32)
+        self.columns = np.asarray(columns, dtype=np.float32)
+
+    @classmethod
+    def from_page(cls, name: str, image: np.ndarray, config: dict):
+        """Makes the template of a page, its fields found the same way the processing finds them on the whole page."""
+        boxes = find_boxes(image, config["Dilation Width"], config["Dilation Height"])
+        return cls(name, image.shape[:2], filter_boxes(boxes, config), *get_profiles(image))
+
+    @classmethod
+    def from_json(cls, data: dict):
+        return cls(data["name"], data["shape"], data["fields"], data["rows"], data["columns"])
+
+    def to_json(self) -> dict:
+        return {"name": self.name, "shape": list(self.shape), "fields": self.fields.tolist(),
+                "rows": np.round(self.rows, 4).tolist(), "columns": np.round(self.columns, 4).tolist()}
+
+    def align(self, rows: np.ndarray, columns: np.ndarray) -> tuple[tuple, tuple, float]:
+        """Fits the template to the profiles of a page, returns the (scale, shift) of the x and y axes in pixels and
+        the score of the worse fitting axis."""
+        scale_x, shift_x, score_x = align_profiles(self.columns, columns)
+        scale_y, shift_y, score_y = align_profiles(self.rows, rows)
+        return (scale_x, shift_x * _profile_shrink), (scale_y, shift_y * _profile_shrink), min(score_x, score_y)
+
+    def get_windows(self, alignment_x: tuple, alignment_y: tuple) -> np.ndarray:
+        """Returns the (x0, y0, x1, y1) region every field is at on an aligned page, grown by the field margin, with
+        overlapping regions merged into one."""
+        (scale_x, shift_x), (scale_y, shift_y) = alignment_x, alignment_y
+        x, y, w, h = self.fields.astype(np.float64).T
+        windows = np.stack([x * scale_x + shift_x - _field_margin, y * scale_y + shift_y - _field_margin,
+                            (x + w) * scale_x + shift_x + _field_margin, (y + h) * scale_y + shift_y + _field_margin],
+                           axis=1).round().astype(np.int32)
+        merged = []
+        for window in windows[np.argsort(windows[:, 1], kind='stable')].tolist():
+            if merged and window[1] < merged[-1][3] and window[0] < merged[-1][2] and window[2] > merged[-1][0]:
+                merged[-1] = [min(merged[-1][0], window[0]), merged[-1][1], max(merged[-1][2], window[2]),
+                              max(merged[-1][3], window[3])]
+            else:
+                merged.append(window)
+        del x, y, w, h, windows
+        return np.array(merged, dtype=np.int32).reshape(-1, 4)
+
+
+class TemplateRegistry:
+    """The form templates registered in the directory. A page is matched to the template its profiles fit best, and
+    then only thresholded and dilated inside the fields of that template, with one Otsu threshold for all of them so a
+    field left empty doesn't get its own threshold picked out of the paper's noise. Pages matching no template are
+    segmented as usual. Gets pickled to the worker processes, it's only the few small templates.
+
+    Args: directory: str
+    """
+
+    __slots__ = "directory", "templates", "fingerprint"
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.templates = {}
+        if os.path.isdir(directory):
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith(".json"):
+                    template = FormTemplate.from_json(read_json(os.path.join(directory, filename)))
+                    self.templates.update({template.name: template})
+        # The hash of every template, so the recognition cache misses once the templates change
+        self.fingerprint = self._get_fingerprint()
+
+    def _get_fingerprint(self) -> str:
+        templates = [self.templates[name].to_json() for name in sorted(self.templates.keys())]
+        return hashlib.sha256(json.dumps(templates, sort_keys=True).encode()).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def _get_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def register(self, name: str, image: np.ndarray, config: dict) -> FormTemplate:
+        """Makes the template of the page and writes it to the directory, replacing any with the same name."""
+        template = FormTemplate.from_page(name, image, config)
+        check_folder_and_create(self.directory)
+        dump_json(self._get_path(name), template.to_json())
+        self.templates.update({name: template})
+        self.fingerprint = self._get_fingerprint()
+        return template
+
+    def remove(self, name: str) -> None:
+        del self.templates[name]
+        os.remove(self._get_path(name))
+        self.fingerprint = self._get_fingerprint()
+
+    def match(self, image: np.ndarray) -> tuple[FormTemplate, tuple, tuple] | None:
+        """Returns the template the page fits best with its x and y (scale, shift), None if it fits none well."""
+        rows, columns = get_profiles(image)
+        best = None
+        best_score = _min_score
+        for template in self.templates.values():
+            alignment_x, alignment_y, score = template.align(rows, columns)
+            if score >= best_score:
+                best, best_score = (template, alignment_x, alignment_y), score
+        del rows, columns
+        return best
+
+    def find_boxes(self, image: np.ndarray, config: dict, engine: str = "contours") -> np.ndarray | None:
+        """Returns the boxes of every contour inside the fields of the template the page matches, in the same order
+        find_boxes gives them, None if the page matches no template."""
+        found = self.match(image)
+        if found is None:
+            return None
+        template, alignment_x, alignment_y = found
+        windows = template.get_windows(alignment_x, alignment_y)
+        height, width = image.shape[:2]
+        windows[:, [0, 2]] = windows[:, [0, 2]].clip(0, width)
+        windows[:, [1, 3]] = windows[:, [1, 3]].clip(0, height)
+        windows = windows[(windows[:, 2] > windows[:, 0]) & (windows[:, 3] > windows[:, 1])]
+        if not len(windows):
+            return np.empty((0, 4), dtype=np.int32)
+        pixels = np.concatenate([image[y0:y1, x0:x1].ravel() for x0, y0, x1, y1 in windows.tolist()])
+        threshold = cv2.threshold(pixels.reshape(1, -1), 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[0]
+        boxes = np.concatenate([find_boxes(image, config["Dilation Width"], config["Dilation Height"], window, engine,
+                                           threshold) for window in windows.tolist()])
+        # find_boxes gives the contours last found first, from the bottom of the page up
+        boxes = boxes[np.lexsort((boxes[:, 0], boxes[:, 1]))[::-1]]
+        del windows, pixels
+        return np.ascontiguousarray(boxes)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Registers the forms the pages are scanned from.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    register = commands.add_parser("register", help="Registers a filled in page as the template of its form.")
+    register.add_argument("page", help="Image of a page with every field filled in.")
+    register.add_argument("--name", required=True, help="Name of the form, e.g. the sheet name.")
+    register.add_argument("--config", default=defaults.path_to_config_image, help="Image config of the page.")
+    commands.add_parser("list", help="Lists the registered templates.")
+    remove = commands.add_parser("remove", help="Removes a registered template.")
+    remove.add_argument("name", help="Name of the form.")
+    args = parser.parse_args()
+
+    registry = TemplateRegistry(defaults.directory_of_templates)
+    if args.command == "register":
+        template = registry.register(args.name, read_grey_image(args.page),
+                                     read_json(args.config, defaults.default_image_config))
+        print(f"Registered '{template.name}' with {len(template.fields)} fields. Only these fields are looked for on "
+              f"the pages matching it once 'Form Templates' is 1 in the processing config.")
+    elif args.command == "list":
+        for template in registry.templates.values():
+            print(f"{template.name}: {template.shape[1]}x{template.shape[0]}, {len(template.fields)} fields")
+    else:
+        if args.name not in registry.templates:
+            print(f"No template named '{args.name}'.")
+            return 1
+        registry.remove(args.name)
+        print(f"Removed '{args.name}'.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,7 @@ import os
 import json
 import time
 import functools
+import natsort
 import numpy as np
 
 
@@ -32,6 +33,39 @@ def read_json(filename: str, data: dict | list = None) -> dict | list:
         return create_json(filename, data)
 
 
+# Separates the path of a multi-page TIFF from the number of one of its pages in a page id, e.g. 'batch.tif#p12'
+page_separator = "#p"
+_multi_page_extensions = (".tif", ".tiff")
+
+
+def get_image_paths(filepath: str, extensions: list) -> list:
+    """Returns the natural sorted paths to all the images in the folder with one of the extensions, whatever the
+    case of the file's extension. A multi-page TIFF gets a page id for each of its pages instead."""
+    image_paths = []
+    for file in natsort.natsorted([f for f in os.listdir(filepath)]):
+        if os.path.splitext(file)[1].lower() in extensions:
+            image_paths.extend(get_page_ids(os.path.join(filepath, file)))
+    return image_paths
+
+
+def get_page_ids(filepath: str) -> list:
+    """Returns the page id of every page in the file, numbered from 1 for a multi-page TIFF, otherwise the file's
+    path is its only page id. Counting the pages of a TIFF doesn't decode any of them."""
+    if os.path.splitext(filepath)[1].lower() in _multi_page_extensions:
+        count = cv2.imcount(filepath)
+        if count > 1:
+            return [f"{filepath}{page_separator}{number}" for number in range(1, count + 1)]
+    return [filepath]
+
+
+def split_page_id(page_id: str) -> tuple[str, int]:
+    """Splits the page id into the path of its file and its page number, which is 0 for a file with one page."""
+    filepath, separator, number = page_id.rpartition(page_separator)
+    if separator and number.isdigit():
+        return filepath, int(number)
+    return page_id, 0
+
+
 def create_json(filename: str, data: dict | list) -> dict | list:
     """Creates the json file if it doesn't exist."""
     with open(filename, 'w') as file:
@@ -91,25 +125,28 @@ def read_image(image_path: str, mode: int = -1) -> np.ndarray:
     return cv2.imread(image_path, mode)
 
 
-def sort_contours(cnts: list, method: str = "left-to-right"):
-    """Sorts the contours from left_to_right in an image."""
-    # initialize the reverse flag and sort index
-    reverse = False
-    i = 0
-    # handle if we need to sort in reverse
-    if method == "right-to-left" or method == "bottom-to-top":
-        reverse = True
-    # handle if we are sorting against the y-coordinate rather than
-    # the x-coordinate of the bounding box
-    if method == "top-to-bottom" or method == "bottom-to-top":
-        i = 1
-    # construct the list of bounding boxes and sort them from top to
-    # bottom
-    bounding_boxes = [cv2.boundingRect(c) for c in cnts]
-    (cnts, bounding_boxes) = zip(*sorted(zip(cnts, bounding_boxes),
-                                         key=lambda b: b[1][i], reverse=reverse))
-    # return the list of sorted contours and bounding boxes
-    return cnts, bounding_boxes
+_reduced_grey_modes = {2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+                       8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+
+def read_grey_image(image_path: str, reduce: int = 1) -> np.ndarray:
+    """Decodes the image straight to 8-bit grayscale, so no colour buffer is ever allocated. Grey, alpha and 16-bit
+    images all come out the same way. A reduce of 2, 4 or 8 decodes at that fraction of the size for previews, which
+    for JPEGs skips most of the decode. Takes page ids too, decoding only that page of the multi-page TIFF."""
+    mode = _reduced_grey_modes.get(reduce, cv2.IMREAD_GRAYSCALE)
+    filepath, number = split_page_id(image_path)
+    if number:
+        # The TIFF decoder can't decode at a reduced size, so the page gets shrunk after
+        found, images = cv2.imreadmulti(filepath, start=number - 1, count=1, flags=cv2.IMREAD_GRAYSCALE)
+        image = images[0] if found and images else None
+        if image is not None and reduce in _reduced_grey_modes:
+            image = cv2.resize(image, (image.shape[1] // reduce, image.shape[0] // reduce),
+                               interpolation=cv2.INTER_AREA)
+    else:
+        image = cv2.imread(image_path, mode)
+    if image is None:
+        raise OSError(f"Could not decode the image at '{image_path}'.")
+    return image
 
 
 def timefunc(func):
@@ -0,0 +1,54 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+
+import os
+import natsort
+from Backend_Scripts.utils_4_processor import get_page_ids
+
+
+class FolderWatcher:
+    """Finds the images added to or changed in a folder since the last scan, by the size and modified time of each
+    file, so a folder the scanners keep dropping pages into can be processed as the pages come in. A file only counts
+    once it has the same size and modified time on two scans in a row, so a page still being written is left for the
+    next scan. Every page of a multi-page TIFF is handed out, by its page id.
+
+    Args: folder: str,
+        extensions: list[str]
+    """
+
+    __slots__ = "folder", "extensions", "signatures", "_pending"
+
+    def __init__(self, folder: str, extensions: list) -> None:
+        self.folder = folder
+        self.extensions = extensions
+        # The (size, modified time) of every image already handed out, with the filepath as key
+        self.signatures = {}
+        # The new or changed images seen on the last scan, waiting to be seen unchanged once more
+        self._pending = {}
+
+    def _list(self) -> dict:
+        """Returns the (size, modified time) of every image in the folder, with the filepath as key."""
+        found = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if os.path.splitext(entry.name)[1].lower() in self.extensions and entry.is_file():
+                    stat = entry.stat()
+                    found.update({entry.path: (stat.st_size, stat.st_mtime_ns)})
+        return found
+
+    def snapshot(self) -> list:
+        """Takes every image in the folder as already handed out, returns their natural sorted paths."""
+        self.signatures = self._list()
+        self._pending = {}
+        return [page_id for filepath in natsort.natsorted(self.signatures.keys()) for page_id in get_page_ids(filepath)]
+
+    def scan(self) -> list:
+        """Returns the natural sorted paths of the images that are new or changed since the last scan."""
+        found = self._list()
+        ready = [filepath for filepath, signature in found.items()
+                 if self.signatures.get(filepath) != signature and self._pending.get(filepath) == signature]
+        self._pending = {filepath: signature for filepath, signature in found.items()
+                         if self.signatures.get(filepath) != signature and filepath not in ready}
+        for filepath in ready:
+            self.signatures.update({filepath: found[filepath]})
+        del found
+        return [page_id for filepath in natsort.natsorted(ready) for page_id in get_page_ids(filepath)]
@@ -16,19 +16,21 @@ class CustomProgress(tk.Toplevel):
     _title = "Processing Images..."
     _default_font = ("Arial", 14)
 
-    __slots__ = "interface", "main_frame", "progress_bar", "time", "time_label"
+    __slots__ = "interface", "main_frame", "message_label", "progress_bar", "time", "time_label"
 
-    def __init__(self, interface, *args, **kwargs):
+    def __init__(self, interface, *args, cancel_command=None, **kwargs):
         tk.Toplevel.__init__(self, interface, *args, **kwargs)
         self.interface = interface
         self.overrideredirect(True)
-        set_window(self, self._width, self._height, self._title, parent=self.interface)
+        height = self._height if cancel_command is None else self._height + 35
+        set_window(self, self._width, height, self._title, parent=self.interface)
 
         self.main_frame = ttk.Frame(self, borderwidth=2, relief='raised')
         self.main_frame.pack(side='top', expand=True, fill='both')
 
-        ttk.Label(self.main_frame, text="Please wait for processing to finish.", font=self._default_font,
-                  anchor='center').pack(pady=5)
+        self.message_label = ttk.Label(self.main_frame, text="Please wait for processing to finish.",
+                                       font=self._default_font, anchor='center')
+        self.message_label.pack(pady=5)
 
         self.progress_bar = ttk.Progressbar(self.main_frame, orient=tk.HORIZONTAL, length=250,
                                             mode='indeterminate')
@@ -42,6 +44,19 @@ class CustomProgress(tk.Toplevel):
                                     anchor='center')
         self.time_label.pack(pady=5)
 
+        if cancel_command is not None:
+            ttk.Button(self.main_frame, text="Cancel", command=cancel_command).pack(pady=(0, 5))
+
+    def set_progress(self, done: int, total: int) -> None:
+        """Switches the progress bar to show how much of the total is done."""
+        if str(self.progress_bar.cget('mode')) != 'determinate':
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode='determinate')
+        self.progress_bar.configure(maximum=max(total, 1), value=done)
+
+    def set_message(self, message: str) -> None:
+        self.message_label.configure(text=message)
+
     def increase_time(self):
         self.time += 1
         self.time_label.configure(text=f"{self.time}: seconds elapsed")
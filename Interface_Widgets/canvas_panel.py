@@ -9,11 +9,17 @@ except ImportError:  # Python 3
     from tkinter import messagebox, filedialog
 
 from PIL import ImageTk
+from Backend_Scripts.render_processor import RenderWorker
 
 
 class CanvasPane(ttk.Frame):
+    # How long in ms the window has to stop resizing before the high quality render is done
+    _settle_delay = 150
+    # How often in ms the render thread gets checked for a finished render
+    _render_poll = 10
 
-    __slots__ = "interface", "image_pro", "canvas", "drawn", "current_image"
+    __slots__ = "interface", "image_pro", "canvas", "drawn", "current_image", "size", "fast_job", "settle_job", \
+                "render_worker", "render_job"
 
     def __init__(self, interface, *args, **kwargs):
         ttk.Frame.__init__(self, interface, *args, **kwargs)
@@ -27,22 +33,56 @@ class CanvasPane(ttk.Frame):
         self.drawn = None
         # The current image drawn to canvas
         self.current_image = None
+        # The size the image was last resized to, and the scheduled fast and high quality resizes
+        self.size = None
+        self.fast_job = None
+        self.settle_job = None
+        # Resizes the images off the Tk thread, and the scheduled check for its result
+        self.render_worker = RenderWorker()
+        self.render_job = None
 
     def on_resize(self, event: tk.Event) -> None:
-        """Resizes the current drawn image on the screen to the window size."""
-        self.current_image = self.image_pro.resize_image(self.winfo_width(), self.winfo_height())
-        # self.canvas.itemconfig(self.drawn, image=self.current_image)
-        self.canvas.configure(image=self.current_image)
-
-    def create_image(self, loaded_image: ImageTk.PhotoImage) -> None:
-        """Creates the first image and draws it to the canvas."""
-        if self.drawn:
-            self.set_current_drawn(loaded_image)
+        """Resizes the current drawn image on the screen to the window size. The resize events of a window drag are
+        coalesced into one fast resize whenever Tk is idle, and one high quality resize once they settle."""
+        size = (self.winfo_width(), self.winfo_height())
+        if size == self.size:
+            return None
+        self.size = size
+        if self.fast_job is None:
+            self.fast_job = self.after_idle(self._resize, True)
+        if self.settle_job is not None:
+            self.after_cancel(self.settle_job)
+        self.settle_job = self.after(self._settle_delay, self._resize, False)
+
+    def _resize(self, fast: bool) -> None:
+        if fast:
+            self.fast_job = None
         else:
+            self.settle_job = None
+        self.render(*self.size, fast)
+
+    def render(self, width: int, height: int, fast: bool = False) -> None:
+        """Queues the current shown image to be resized to width by height on the render thread."""
+        self.render_worker.submit(self.image_pro.render_image, self.image_pro.current_shown, width, height, fast,
+                                  self.image_pro.current_crop)
+        if self.render_job is None:
+            self.render_job = self.after(self._render_poll, self._check_render)
+
+    def _check_render(self) -> None:
+        image, busy = self.render_worker.get_result()
+        if image is None:
+            self.render_job = self.after(self._render_poll, self._check_render) if busy else None
+            return None
+        self.render_job = None
+        self.set_current_drawn(ImageTk.PhotoImage(image))
+        del image
+
+    def create_image(self, width: int, height: int) -> None:
+        """Creates the first image and draws it to the canvas, resized on the render thread."""
+        if not self.drawn:
             # self.drawn = self.canvas.create_image(0, 0, image=loaded_image, anchor='nw')
-            self.canvas.configure(image=loaded_image)
             self.bind("<Configure>", self.on_resize)
-            self.current_image = loaded_image
+        self.render(width, height)
 
     def set_current_drawn(self, loaded_image: ImageTk.PhotoImage) -> None:
         """Sets the image loaded image to the canvas."""
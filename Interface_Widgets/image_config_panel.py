@@ -173,6 +173,16 @@ class ImageConfigPane(ttk.Frame):
         self.current_image_path = cur_img_path
         self.set_config()
 
+    def add_pages(self, image_paths: list) -> None:
+        """Creates the widgets for the pages that are new with the default config, keeping the pages already there."""
+        for key in image_paths:
+            if key in self.vs_frames:
+                continue
+            vs_frame = VerticalScrolledFrame(self.main_frame)
+            self.vs_frames.update({key: vs_frame})
+            self.entries.update({key: self.create_widgets(vs_frame.interior, self.default_config)})
+        self.set_config()
+
     def destroy_widgets(self):
         """Destroys the vs_frames."""
         if self.vs_frames:
@@ -170,6 +170,17 @@ class OutputPane(ttk.Frame):
             else:
                 self.entries.update({key: []})
 
+    def add_pages(self, output: dict) -> None:
+        """Creates the output entries for pages that are new, and replaces the entries of the pages already there."""
+        for key, values in output.items():
+            if key in self.vs_frames:
+                self._destroy_entry_label(key)
+            else:
+                self.vs_frames.update({key: VerticalScrolledFrame(self.main_frame)})
+            self.entries.update({key: self.create_widgets(self.vs_frames[key].interior, values) if values else []})
+        if self.current_image_path in output:
+            self.set_page(self.current_image_path)
+
     def destroy_widgets(self):
         """Destroys all vs_frames and all widgets inside said frame."""
         if self.vs_frames:
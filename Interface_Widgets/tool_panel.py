@@ -15,13 +15,15 @@ import threading
 
 class ToolPane(ttk.Frame):
 
-    __slots__ = "interface", "image_pro", "canvas", "output_pane", "image_c_pane", "thread", "output_shown", \
-                "image_c_shown", "output_created", "progress_bar"
+    __slots__ = "interface", "image_pro", "model_pro", "canvas", "output_pane", "image_c_pane", "thread", \
+                "output_shown", "image_c_shown", "output_created", "progress_bar", "preload_cancel", \
+                "preload_progress", "watch_btn", "watch_job", "preload_thread", "preload_bar"
 
     def __init__(self, interface, *args, **kwargs) -> None:
         ttk.Frame.__init__(self, interface, *args, **kwargs)
         self.interface = interface
         self.image_pro = interface.image_pro
+        self.model_pro = interface.model_pro
         self.canvas = interface.canvas_pane
         self.output_pane = interface.output_pane
         self.image_c_pane = interface.image_c_pane
@@ -36,6 +38,15 @@ class ToolPane(ttk.Frame):
         self.output_created = False
 
         self.progress_bar = None
+        # The page preload's own thread and progress window, so processing can run while pages are still preloading
+        self.preload_thread = None
+        self.preload_bar = None
+        # Set to stop the page preload, and the (done, total) pages it has decoded which the preload thread updates
+        self.preload_cancel = None
+        self.preload_progress = (0, 0)
+        # The watch mode button, and the scheduled check of the scanned images folder while it's on
+        self.watch_btn = None
+        self.watch_job = None
 
         self.create_ui()
 
@@ -75,6 +86,10 @@ class ToolPane(ttk.Frame):
         pre_process_single_btn.pack(side='left', anchor='nw', padx=2, pady=2)
         ToolTip(pre_process_single_btn, self.interface, msg="Pre-Process Current Image")
 
+        self.watch_btn = ttk.Button(left_frame, text="Watch Folder", command=self.toggle_watch)
+        self.watch_btn.pack(side='left', anchor='nw', padx=2, pady=2)
+        ToolTip(self.watch_btn, self.interface, msg="Processes New Images as they come into the Scanned Images Path")
+
         # Right frame widgets
         show_output_btn = ttk.Button(right_frame, text="Show Output",
                                      command=lambda event=None: self.show_output_panel(show_output_btn,
@@ -141,6 +156,49 @@ class ToolPane(ttk.Frame):
             self.canvas.destroy_images()
             tk.messagebox.showinfo("Error", "Could not load images from 'Scanned Images Path'\n"
                                             "Please set the correct path to the scanned images.", parent=self.interface)
+            return None
+        if self.image_pro.config_pro.get_processing_config("Preload Pages"):
+            self.preload_images()
+
+    def preload_images(self) -> None:
+        """Decodes the pages into the page cache on a background thread, with the first page already showing. The
+        progress bar shows how many pages are done and can cancel the rest. It doesn't grab the window, so the pages
+        can be gone through while the rest are loading. A preload still running for the pages loaded before is
+        cancelled."""
+        if self.preload_cancel is not None:
+            self.preload_cancel.set()
+        self.preload_cancel = threading.Event()
+        self.preload_progress = (0, 0)
+        self.preload_thread = threading.Thread(target=self.image_pro.preload_pages, daemon=True,
+                                               args=(self._set_preload_progress, self.preload_cancel))
+        self.preload_thread.start()
+
+        self.preload_bar = CustomProgress(self.interface, cancel_command=self.preload_cancel.set)
+        self.preload_bar.set_message("Loading pages...")
+
+        self.check_preload(self.preload_thread, self.preload_bar, self.preload_cancel)
+
+    def _set_preload_progress(self, done: int, total: int) -> None:
+        # Called from the preload thread, so only the tuple gets swapped here and Tk is updated by check_preload
+        self.preload_progress = (done, total)
+
+    def check_preload(self, thread: threading.Thread, progress_bar: CustomProgress, cancel: threading.Event,
+                      elapsed: int = 0) -> None:
+        """Updates the progress bar of the preload until it's done or cancelled."""
+        if thread.is_alive():
+            if thread is self.preload_thread:
+                progress_bar.set_progress(*self.preload_progress)
+            if cancel.is_set():
+                progress_bar.set_message("Cancelling...")
+            elapsed += 50
+            if elapsed % 1000 == 0:
+                progress_bar.increase_time()
+            self.after(50, lambda e=None: self.check_preload(thread, progress_bar, cancel, elapsed))
+        else:
+            progress_bar.destroy()
+            if progress_bar is self.preload_bar:
+                self.preload_bar = None
+            self.update_idletasks()
 
     def pre_process_all(self) -> None:
         """Pre-processes original images to set where the crop area will be for grabbing the digits."""
@@ -215,6 +273,58 @@ class ToolPane(ttk.Frame):
                                       parent=self.interface):
                 self.create_thread(self.image_pro.process_single, creation=False, reprocess=False)
 
+    def toggle_watch(self) -> None:
+        """Turns the watch mode on and off. While it's on, the scanned images folder gets checked every
+        'Watch Interval' ms, and only the pages that are new or changed get processed and added to the output."""
+        if self.watch_job is not None:
+            self.after_cancel(self.watch_job)
+            self.watch_job = None
+            self.watch_btn.configure(style="TButton")
+            return None
+        if not self.image_pro.original_images:
+            tk.messagebox.showerror("Error", "No Images are loaded. \n"
+                                             "Please Load Images first before trying to watch the folder.",
+                                    parent=self.interface)
+            return None
+        self.watch_btn.configure(style="Red.TButton")
+        self.watch_job = self.after(0, self.check_folder)
+
+    def check_folder(self) -> None:
+        """Processes the pages that came into the scanned images folder since the last check on a background thread,
+        unless images are still being processed."""
+        interval = self.image_pro.config_pro.get_processing_config("Watch Interval")
+        if self.thread is not None and self.thread.is_alive():
+            self.watch_job = self.after(interval, self.check_folder)
+            return None
+        filepaths = self.image_pro.scan_folder()
+        if not filepaths:
+            self.watch_job = self.after(interval, self.check_folder)
+            return None
+        self.image_c_pane.add_pages(filepaths)
+        del self.thread
+        self.thread = threading.Thread(target=self.image_pro.process_pages, args=(filepaths,), daemon=True)
+        self.thread.start()
+        self.check_watch_thread(filepaths)
+
+    def check_watch_thread(self, filepaths: list) -> None:
+        """Adds the output of the watched pages to the output panel once they're processed."""
+        if self.thread.is_alive():
+            self.watch_job = self.after(100, lambda e=None: self.check_watch_thread(filepaths))
+            return None
+        if self.model_pro.get_load_error() is not None:
+            self.toggle_watch()
+            tk.messagebox.showerror("Error", f"Could not load the model.\n{self.model_pro.get_load_error()}",
+                                    parent=self.interface)
+            return None
+        output, _ = self.image_pro.get_output()
+        if output:
+            self.output_pane.add_pages({filepath: output[filepath] for filepath in filepaths if filepath in output})
+            self.output_created = True
+        if self.image_pro.get_current_img_path() in filepaths:
+            self.update_canvas()
+        self.watch_job = self.after(self.image_pro.config_pro.get_processing_config("Watch Interval"),
+                                    self.check_folder)
+
     def create_thread(self, func, creation: bool, reprocess: bool) -> None:
         """Creates a background thread for the processing of images."""
         del self.thread
@@ -231,9 +341,18 @@ class ToolPane(ttk.Frame):
         """Checks if the _process_images is done."""
         if self.thread.is_alive():
             self.after(1000, lambda e=None: self.check_thread(creation, reprocess))
+            # The processing thread waits on the model if it's still loading in the background
+            if self.model_pro.is_ready():
+                self.progress_bar.set_message("Please wait for processing to finish.")
+            else:
+                self.progress_bar.set_message("Please wait for the model to load.")
             self.progress_bar.increase_time()
         else:
             self.progress_bar.destroy()
+            if self.model_pro.get_load_error() is not None:
+                tk.messagebox.showerror("Error", f"Could not load the model.\n{self.model_pro.get_load_error()}",
+                                        parent=self.interface)
+                return None
             self.update_canvas()
             if creation is False and reprocess is False:
                 output, current_image_path = self.image_pro.get_current_output()
@@ -245,10 +364,8 @@ class ToolPane(ttk.Frame):
 
     def update_canvas(self) -> None:
         """Updates the Canvas's image to be drawn."""
-        array = self.image_pro.set_current_image()
-        tk_photo = self.image_pro.convert_image_from_array(array, self.canvas.winfo_width(),
-                                                           self.canvas.winfo_height())
-        self.canvas.create_image(tk_photo)
+        self.image_pro.set_current_image()
+        self.canvas.create_image(self.canvas.winfo_width(), self.canvas.winfo_height())
 
     def create_output_pane(self) -> None:
         """Creates and sets the Output Panel."""
@@ -0,0 +1,108 @@
+# Copyright © 2023 FurryKiwi <normalusage2@gmail.com>
+"""Headless batch mode, for running the recognition on servers without a display.
+
+Run from the project root:
+    python batch.py --input "path/to/scanned/images" --config Core/Config/Config_Image.json --out results.json
+
+With --watch it keeps running after the pages already in the folder are done, recognizing the pages that come into
+the folder and rewriting the output file each time, until it's stopped with Ctrl+C.
+
+Never imports Tkinter. The output file has the same format as the one saved from the Output Panel.
+"""
+
+import sys
+import time
+import argparse
+import natsort
+from Backend_Scripts import config_defaults as defaults
+from Backend_Scripts.model_processor import ModelPro
+from Backend_Scripts.recognition_processor import RecognitionPro
+from Backend_Scripts.watch_processor import FolderWatcher
+from Backend_Scripts.utils_4_processor import read_json, dump_json, get_image_paths, timefunc
+
+
+class HeadlessConfig:
+    """Stands in for the ConfigPro without any Tk. Every page uses the same image config, and the processing config
+    is read from Config_Processing.json with any command line overrides on top.
+
+    Args: image_config: dict,
+        overrides: dict
+    """
+
+    __slots__ = "image_config", "processing_config"
+
+    def __init__(self, image_config: dict, overrides: dict) -> None:
+        self.image_config = image_config
+        self.processing_config = read_json(defaults.path_to_config_processing, defaults.default_processing_config)
+        self.processing_config.update({key: value for key, value in overrides.items() if value is not None})
+
+    def get_processing_config(self, key: str) -> int | str:
+        return self.processing_config.get(key, defaults.default_processing_config[key])
+
+    def get_custom_config_by_key(self, image_path: str) -> dict:
+        return self.image_config
+
+
+class BatchRunner:
+    """Stands in for the Interface, holding the config, model and recognition processors without any window."""
+
+    __slots__ = "config_pro", "model_pro", "recognition_pro"
+
+    def __init__(self, image_config: dict, overrides: dict) -> None:
+        self.config_pro = HeadlessConfig(image_config, overrides)
+        self.model_pro = ModelPro(self)
+        self.recognition_pro = RecognitionPro(self)
+
+    @timefunc
+    def run(self, input_path: str) -> dict:
+        """Recognizes every page in the folder, returns the output sorted the same way the Output Panel saves it."""
+        output = self.recognition_pro.recognize(get_image_paths(input_path, defaults.image_extensions))
+        return {key: output[key] for key in natsort.natsorted(output.keys())}
+
+    def watch(self, input_path: str, out_path: str) -> None:
+        """Recognizes the pages in the folder, then checks it every 'Watch Interval' ms and recognizes only the pages
+        that are new or changed, rewriting the output file after each round. Runs until interrupted."""
+        watcher = FolderWatcher(input_path, defaults.image_extensions)
+        output = {}
+        filepaths = watcher.snapshot()
+        while True:
+            if filepaths:
+                self.recognition_pro.segment_cache.discard(filepaths)
+                output.update(self.recognition_pro.recognize(filepaths))
+                dump_json(out_path, {key: output[key] for key in natsort.natsorted(output.keys())})
+                print(f"Recognized {len(filepaths)} new or changed pages, wrote the output of {len(output)} pages to "
+                      f"'{out_path}'.")
+            time.sleep(self.config_pro.get_processing_config("Watch Interval") / 1000)
+            filepaths = watcher.scan()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Recognizes the handwritten numbers of a folder of scanned pages.")
+    parser.add_argument("--input", required=True, help="Folder of scanned pages.")
+    parser.add_argument("--config", default=defaults.path_to_config_image, help="Image config used for every page.")
+    parser.add_argument("--out", required=True, help="Json file to write the output to.")
+    parser.add_argument("--mode", choices=["serial", "parallel", "stream"], help="Overrides the Processing Mode.")
+    parser.add_argument("--backend", help="Overrides the Model Backend, e.g. 'numpy' or 'tflite-int8'.")
+    parser.add_argument("--workers", type=int, help="Overrides the Worker Count.")
+    parser.add_argument("--engine", choices=["contours", "components"], help="Overrides the Segmentation Engine.")
+    parser.add_argument("--watch", action="store_true", help="Keep recognizing the pages that come into the folder.")
+    parser.add_argument("--interval", type=int, help="Overrides the Watch Interval, in milliseconds.")
+    args = parser.parse_args()
+
+    overrides = {"Processing Mode": args.mode, "Model Backend": args.backend, "Worker Count": args.workers,
+                 "Watch Interval": args.interval, "Segmentation Engine": args.engine}
+    runner = BatchRunner(read_json(args.config, defaults.default_image_config), overrides)
+    if args.watch:
+        try:
+            runner.watch(args.input, args.out)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+        return 0
+    output = runner.run(args.input)
+    dump_json(args.out, output)
+    print(f"Wrote the output of {len(output)} pages to '{args.out}'.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())